@@ -1,10 +1,30 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi.responses import FileResponse, HTMLResponse
 from fastapi import FastAPI
 from routers.video import video_router
-
-app = FastAPI()
+from routers.metrics import metrics_router
+from routers.health import health_router
+from routers.lot import lot_router, start_lot_coordinator, stop_lot_coordinator
+from services.video_service import shutdown_detection_pool, warm_up
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 모델 로드/warm-up은 백그라운드에서 진행, 서버는 바로 요청을 받음 (/readyz로 준비 여부 확인)
+    warmup_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    start_lot_coordinator()
+    yield
+    stop_lot_coordinator()
+    if not warmup_task.done():
+        warmup_task.cancel()
+    shutdown_detection_pool()
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(video_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
+app.include_router(lot_router)
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -1,12 +1,26 @@
-import torch
-from ultralytics import YOLO
+import os
+import time
+from pathlib import Path
 
-def load_yolo_model(model_path="C:\\Users\\user\\Documents\\GitHub\\test\\JKL\\app\\models\\best_3000_xl.pt"):  
-    """ YOLO 모델 로드 """
+# torch / ultralytics는 import만으로 수 초가 걸리므로 실제로 로드할 때 import
+from services.metrics import MODEL_LOAD_SECONDS
+
+# PARKING_MODEL_PATH 환경변수로 .pt / .onnx (FP32, INT8) 가중치 교체 가능
+DEFAULT_MODEL_PATH = "C:\\Users\\user\\Documents\\GitHub\\test\\JKL\\app\\models\\best_3000_xl.pt"
+MODEL_PATH = os.environ.get("PARKING_MODEL_PATH", DEFAULT_MODEL_PATH)
+
+def load_yolo_model(model_path=MODEL_PATH):  
+    """ YOLO 모델 로드 (.pt 또는 export_models.py로 만든 .onnx) """
     try:
-        model = YOLO(model_path)
+        from ultralytics import YOLO
+
+        # export된 모델은 task 정보를 알 수 없으므로 직접 지정
+        task = "detect" if Path(model_path).suffix != ".pt" else None
+        start = time.perf_counter()
+        model = YOLO(model_path, task=task)
+        MODEL_LOAD_SECONDS.set(time.perf_counter() - start, model="yolo")
         print(f"✅ YOLO 모델 로드 완료: {model_path}")
         return model
     except Exception as e:
         print(f"❌ YOLO 모델 로드 실패: {e}")
-        return None
\ No newline at end of file
+        return None
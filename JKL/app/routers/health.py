@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from services.video_service import readiness
+
+health_router = APIRouter(tags=["Monitoring"])
+
+@health_router.get("/healthz")
+def healthz():
+    """ liveness: 프로세스가 요청에 응답할 수 있으면 200 """
+    return {"status": "ok"}
+
+@health_router.get("/readyz")
+def readyz():
+    """ readiness: 모델 로드 + warm-up 추론이 끝났을 때만 200 """
+    status_code = 200 if readiness["ready"] else 503
+    return JSONResponse(status_code=status_code, content=readiness)
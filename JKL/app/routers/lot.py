@@ -0,0 +1,41 @@
+from fastapi import APIRouter, HTTPException
+
+from services.lot import LotCoordinator, load_lot_config
+
+lot_router = APIRouter(prefix="/lot", tags=["Lot"])
+
+# 앱 시작 시 lot 설정이 있으면 생성 (main.py lifespan)
+coordinator = None
+
+def start_lot_coordinator():
+    """ lot.json이 있으면 카메라별 워커 프로세스 시작 """
+    global coordinator
+    config = load_lot_config()
+    if config is None:
+        return None
+    coordinator = LotCoordinator(config)
+    coordinator.start()
+    print(f"✅ 주차장 coordinator 시작: 카메라 {len(config['cameras'])}대, slot {len(config['slots'])}개")
+    return coordinator
+
+def stop_lot_coordinator():
+    if coordinator is not None:
+        coordinator.stop()
+
+def _get_coordinator():
+    if coordinator is None:
+        raise HTTPException(status_code=404, detail="주차장(다중 카메라) 설정이 없습니다.")
+    return coordinator
+
+@lot_router.get("/status")
+def lot_status():
+    """ 카메라 상태와 slot별 빈자리/점유/미확인 목록 """
+    return _get_coordinator().status()
+
+@lot_router.get("/nearest")
+def nearest_free_slot(x: float, y: float):
+    """ 주차장 좌표 (x, y)에서 가장 가까운 빈 slot """
+    slot_id, position, distance = _get_coordinator().nearest_free(x, y)
+    if slot_id is None:
+        return {"message": "No free parking spot found"}
+    return {"slot_id": slot_id, "x": position[0], "y": position[1], "distance": distance}
@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from services.metrics import render_metrics
+
+metrics_router = APIRouter(tags=["Monitoring"])
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """ Prometheus 형식 메트릭 (단계별 처리 시간, 작업 수, 모델 로드 시간) """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
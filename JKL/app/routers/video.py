@@ -1,42 +1,81 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Response, Request
+from fastapi import APIRouter, File, Form, UploadFile, HTTPException, Response, Request
 from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
 import shutil
 import os
+import time
 import uuid
 
-from services.video_service import extract_preview_frame, process_video
+from services.video_service import (RENDER_CODECS, extract_preview_frame, forget_video, get_occupancy, latest_free_boxes,
+                                    process_video, remember_occupancy, render_video, reservations)
+from services.occupancy import accumulator_from_sidecar
+from services.storage import StorageManager
+from services.metrics import JOB_SECONDS, JOBS_IN_PROGRESS, JOBS_TOTAL, JobTrace
 from pydantic import BaseModel
 
 class ParkingSpotRequest(BaseModel):
     video_id: str
     x: int
     y: int
+    trace: bool = False  # True면 프레임별 단계 소요 시간을 저장 (/video/trace/{video_id})
+
+class Point(BaseModel):
+    x: int
+    y: int
+
+class BatchAssignRequest(BaseModel):
+    video_id: str
+    requesters: list[Point]  # 영상 프레임 좌표
+    reserve: bool = True
+
+class ReleaseRequest(BaseModel):
+    video_id: str
+    x: int  # 배정받은 주차칸 중심 (assigned_x, assigned_y)
+    y: int
 
 video_router = APIRouter(prefix="/video", tags=["Video Processing"])
 UPLOAD_DIR = Path("app/resources/videos")
 DOWNLOAD_DIR = Path("app/resources/downloaded")  # 새로운 다운로드 디렉토리
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+ANNOTATIONS_SUFFIX = ".annotations.jsonl"
 
 clicked_points = {}
 pending_videos = {}
+video_cameras = {}  # video_id -> camera_id (ROI 설정 선택용)
+
+def _on_download_deleted(name):
+    """ 분석 결과(sidecar)가 삭제되면 그 영상의 메모리 상태도 같이 정리 """
+    if name.endswith(ANNOTATIONS_SUFFIX):
+        video_id = name[:-len(ANNOTATIONS_SUFFIX)]
+        forget_video(video_id)
+        clicked_points.pop(video_id, None)
+        video_cameras.pop(video_id, None)
+
+# 디렉토리별 용량 제한 / 보관 기간 (환경변수로 조정)
+upload_store = StorageManager.from_env(UPLOAD_DIR, "upload")
+download_store = StorageManager.from_env(DOWNLOAD_DIR, "download", on_delete=_on_download_deleted)
 
 @video_router.post("/upload/")
-async def upload_video(file: UploadFile = File(...)):
+async def upload_video(file: UploadFile = File(...), camera_id: str = Form(None)):
     """ 사용자가 업로드한 영상을 저장 후, 1초 프레임을 제공 """
     video_id = str(uuid.uuid4())
-    file_path = UPLOAD_DIR / f"{video_id}.mp4"
+    video_name = f"{video_id}.mp4"
 
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    with upload_store.atomic_write(video_name) as tmp_path:
+        with tmp_path.open("wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
 
-    preview_path = extract_preview_frame(file_path)
+    with upload_store.hold(video_name) as (file_path,):
+        with upload_store.atomic_write(f"{video_id}.jpg") as tmp_preview:
+            preview_path = extract_preview_frame(file_path, tmp_preview)
 
     if preview_path is None:
         raise HTTPException(status_code=500, detail="1초 프레임 추출 실패")
 
-    pending_videos[video_id] = file_path
+    pending_videos[video_id] = video_name
+    if camera_id:
+        video_cameras[video_id] = camera_id
 
     return {
         "message": "영상 업로드 완료, 1초 프레임을 확인하고 클릭하세요",
@@ -55,40 +94,150 @@ async def select_parking_spot(request: ParkingSpotRequest):
         raise HTTPException(status_code=400, detail="해당 영상이 처리 대기 중이 아닙니다.")
 
     clicked_points[video_id] = (x, y)
-    video_path = pending_videos.pop(video_id)
+    video_name = pending_videos.pop(video_id)
 
-    processed_path = process_video(video_path, video_id, clicked_points)
-    download_path = DOWNLOAD_DIR / processed_path.name
+    if not upload_store.exists(video_name):
+        raise HTTPException(status_code=410, detail="업로드된 영상이 보관 기간이 지나 삭제되었습니다.")
 
-    # ✅ 파일 이동이 실패하는 경우를 디버깅
+    trace = JobTrace(video_id) if request.trace else None
+    JOBS_IN_PROGRESS.inc()
+    start = time.perf_counter()
     try:
-        shutil.move(processed_path, download_path)
-        print(f"✅ 처리된 영상이 이동됨: {download_path}")  # 성공 로그 추가
-    except Exception as e:
-        print(f"❌ 영상 이동 실패: {e}")  # 에러 로그 추가
-        raise HTTPException(status_code=500, detail="영상 이동 실패")
+        # 분석하는 동안 원본 영상은 삭제되지 않도록 보호
+        with upload_store.hold(video_name) as (video_path,):
+            with download_store.atomic_write(f"{video_id}.annotations.jsonl") as tmp_sidecar:
+                # 분석은 오래 걸리므로 이벤트 루프를 막지 않도록 스레드에서 실행
+                await run_in_threadpool(process_video, video_path, video_id, clicked_points, tmp_sidecar, trace,
+                                        video_cameras.get(video_id))
+    except Exception:
+        JOBS_TOTAL.inc(status="failed")
+        clicked_points.pop(video_id, None)
+        video_cameras.pop(video_id, None)
+        raise
+    finally:
+        JOBS_IN_PROGRESS.dec()
+
+    JOB_SECONDS.observe(time.perf_counter() - start)
+    JOBS_TOTAL.inc(status="succeeded")
+    print(f"✅ 분석 결과 저장: {video_id}.annotations.jsonl")
+
+    if trace is not None:
+        with download_store.atomic_write(f"{video_id}.trace.json") as tmp_trace:
+            trace.dump(tmp_trace)
 
     return {
-        "message": "주차 위치 저장 완료, 영상 처리를 시작합니다.",
-        "download_url": f"/video/download/{download_path.name}"
+        "message": "주차 위치 저장 완료, 분석이 끝났습니다.",
+        "annotations_url": f"/video/annotations/{video_id}",
+        "download_url": f"/video/download/{video_id}"
     }
 
-@video_router.get("/download/{filename}")
-def download_video(filename: str):
-    """ 처리된 영상 다운로드 """
-    file_path = DOWNLOAD_DIR / filename
-    if not file_path.exists():
+@video_router.post("/assign_parking_batch/")
+def assign_parking_batch(request: BatchAssignRequest):
+    """ 여러 운전자 좌표를 한 번에 받아 서로 다른 빈 주차칸 배정 (총 거리 최소화) """
+    if request.video_id not in latest_free_boxes:
+        raise HTTPException(status_code=404, detail="분석 결과가 없는 영상입니다.")
+
+    points = [(p.x, p.y) for p in request.requesters]
+    assignments = reservations.assign(request.video_id, points, latest_free_boxes[request.video_id],
+                                      reserve=request.reserve)
+
+    return {
+        "assignments": [
+            {"assigned_x": center[0], "assigned_y": center[1], "distance": distance} if center else None
+            for center, distance in assignments
+        ],
+        "unassigned": sum(1 for center, _ in assignments if center is None),
+        "reservation_ttl": reservations.ttl_seconds if request.reserve else 0,
+    }
+
+@video_router.post("/release_parking/")
+def release_parking(request: ReleaseRequest):
+    """ 배정받은 주차칸 예약 해제 (주차 완료, 취소 등) -> TTL 전에 다시 배정 가능 """
+    released = reservations.release(request.video_id, (request.x, request.y))
+    if not released:
+        raise HTTPException(status_code=404, detail="해당 위치에 예약된 주차칸이 없습니다.")
+    return {"released": released}
+
+def _get_occupancy(video_id):
+    """ 처리 중/완료된 작업의 점유 통계 (메모리에 없으면 sidecar에서 복원) """
+    accumulator = get_occupancy(video_id)
+    if accumulator is None:
+        annotations_name = f"{video_id}{ANNOTATIONS_SUFFIX}"
+        if not download_store.exists(annotations_name):
+            raise HTTPException(status_code=404, detail="분석 결과가 존재하지 않습니다.")
+        with download_store.hold(annotations_name) as (annotations_path,):
+            accumulator = accumulator_from_sidecar(annotations_path)
+        remember_occupancy(video_id, accumulator)
+    return accumulator
+
+@video_router.get("/heatmap/{video_id}")
+def occupancy_heatmap(video_id: str, max_width: int = 480):
+    """ 점유 heatmap PNG (축소 이미지, 새 프레임이 반영된 경우에만 다시 생성) """
+    if max_width <= 0:
+        raise HTTPException(status_code=400, detail="max_width는 양수여야 합니다.")
+    png = _get_occupancy(video_id).heatmap_png(min(max_width, 1920))
+    return Response(content=png, media_type="image/png", headers={"Cache-Control": "no-cache"})
+
+@video_router.get("/utilization/{video_id}")
+def utilization_summary(video_id: str, top_slots: int = 20):
+    """ 점유율, turnover, dwell time 히스토그램 등 요약 (JSON) """
+    return _get_occupancy(video_id).summary(top_slots)
+
+@video_router.get("/annotations/{video_id}")
+def download_annotations(video_id: str):
+    """ 프레임별 분석 결과(jsonl: 박스, 클래스, track ID, 추천 위치) 제공 """
+    annotations_name = f"{video_id}.annotations.jsonl"
+    if not download_store.exists(annotations_name):
+        raise HTTPException(status_code=404, detail="분석 결과가 존재하지 않습니다.")
+    return FileResponse(download_store.touch(annotations_name), media_type="application/x-ndjson",
+                        filename=annotations_name)
+
+@video_router.get("/trace/{video_id}")
+def download_trace(video_id: str):
+    """ 프레임별 단계 소요 시간 (trace=True로 요청한 작업만) """
+    trace_name = f"{video_id}.trace.json"
+    if not download_store.exists(trace_name):
+        raise HTTPException(status_code=404, detail="trace가 존재하지 않습니다.")
+    return FileResponse(download_store.touch(trace_name), media_type="application/json")
+
+@video_router.get("/download/{video_id}")
+def download_video(video_id: str, width: int = None, codec: str = "mp4v"):
+    """ 처리된 영상 다운로드 (처음 요청 시 annotation을 그려서 인코딩, 이후 캐시 사용) """
+    if codec not in RENDER_CODECS:
+        raise HTTPException(status_code=400, detail=f"지원하지 않는 코덱입니다: {codec}")
+    if width is not None and width <= 0:
+        raise HTTPException(status_code=400, detail="width는 양수여야 합니다.")
+
+    annotations_name = f"{video_id}.annotations.jsonl"
+    video_name = f"{video_id}.mp4"
+    if not download_store.exists(annotations_name) or not upload_store.exists(video_name):
         raise HTTPException(status_code=404, detail="다운로드할 영상이 존재하지 않습니다.")
-    return FileResponse(file_path, media_type="video/mp4", filename=filename)
+
+    filename = f"processed_{video_id}_{width or 'full'}_{codec}.mp4"
+    if not download_store.exists(filename):
+        print(f"🎬 영상 렌더링 시작: {filename}")
+        with upload_store.hold(video_name) as (video_path,), download_store.hold(annotations_name) as (annotations_path,):
+            try:
+                with download_store.atomic_write(filename) as tmp_path:
+                    render_video(video_path, annotations_path, tmp_path, width=width, codec=codec)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+    return FileResponse(download_store.touch(filename), media_type="video/mp4", filename=filename)
 
 @video_router.get("/preview/{video_id}")
 def preview_frame(video_id: str):
     """ 1초 프레임 제공 """
-    preview_path = UPLOAD_DIR / f"{video_id}.jpg"
+    preview_name = f"{video_id}.jpg"
     
-    if not preview_path.exists():
-        print(f"❌ 프레임 파일 없음: {preview_path}")  # 로그 추가
+    if not upload_store.exists(preview_name):
+        print(f"❌ 프레임 파일 없음: {preview_name}")  # 로그 추가
         raise HTTPException(status_code=404, detail="프레임 이미지가 존재하지 않습니다.")
     
-    print(f"✅ 프레임 제공: {preview_path}")  # 로그 추가
-    return FileResponse(preview_path, media_type="image/jpeg")
+    print(f"✅ 프레임 제공: {preview_name}")  # 로그 추가
+    return FileResponse(upload_store.touch(preview_name), media_type="image/jpeg")
+
+@video_router.get("/storage/")
+def storage_usage():
+    """ 저장소 사용량 """
+    return {"uploads": upload_store.usage(), "downloads": download_store.usage()}
@@ -0,0 +1,127 @@
+import time
+import threading
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+def box_centers(boxes) -> np.ndarray:
+    """ (M, 4) xyxy 박스 -> (M, 2) 중심 좌표 (find_nearest_parking_space와 같은 정수 중심) """
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) // 2, (boxes[:, 1] + boxes[:, 3]) // 2], axis=1)
+
+def distance_matrix(points, centers) -> np.ndarray:
+    """ (N, 2) 요청 좌표, (M, 2) 주차칸 중심 -> (N, M) 유클리드 거리 """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+    return np.linalg.norm(points[:, None, :] - centers[None, :, :], axis=2)
+
+def greedy_assignment(distances):
+    """ 전체 (요청, 주차칸) 쌍을 거리순으로 보면서 아직 안 쓴 쌍부터 배정 """
+    rows, cols = [], []
+    used_rows, used_cols = set(), set()
+    limit = min(distances.shape)
+    for flat in np.argsort(distances, axis=None, kind="stable"):
+        r, c = divmod(int(flat), distances.shape[1])
+        if r in used_rows or c in used_cols:
+            continue
+        rows.append(r)
+        cols.append(c)
+        used_rows.add(r)
+        used_cols.add(c)
+        if len(rows) == limit:
+            break
+    return np.array(rows, dtype=int), np.array(cols, dtype=int)
+
+def assign_spots(points, free_boxes, method="auto"):
+    """
+    여러 요청자에게 서로 다른 빈 주차칸 배정 (총 거리 최소화)
+    - method: "hungarian" (scipy 필요), "greedy", "auto" (scipy가 있으면 hungarian)
+    - 반환: 요청 순서대로 (중심 좌표, 거리) 또는 빈자리가 모자라면 (None, inf)
+    """
+    assignments = [(None, float("inf"))] * len(points)
+    if not len(points) or not len(free_boxes):
+        return assignments
+
+    centers = box_centers(free_boxes)
+    distances = distance_matrix(points, centers)
+
+    if method == "auto":
+        method = "hungarian" if linear_sum_assignment is not None else "greedy"
+    if method == "hungarian":
+        rows, cols = linear_sum_assignment(distances)
+    else:
+        rows, cols = greedy_assignment(distances)
+
+    assignments = list(assignments)
+    for r, c in zip(rows, cols):
+        assignments[r] = ((int(centers[c, 0]), int(centers[c, 1])), float(distances[r, c]))
+    return assignments
+
+class SpotReservations:
+    """
+    배정된 주차칸을 TTL 동안 예약 -> 이후 요청에 다시 배정하지 않음
+    프레임마다 박스가 조금씩 흔들리므로 예약 중심에서 radius 픽셀 안의 빈칸은 같은 칸으로 봄
+    """
+
+    def __init__(self, ttl_seconds=300, radius=15):
+        self.ttl_seconds = ttl_seconds
+        self.radius = radius
+        self._reserved = {}  # video_id -> [(center, 만료 시각), ...]
+        self._lock = threading.Lock()
+
+    def _active(self, video_id, now):
+        active = [(center, expires) for center, expires in self._reserved.get(video_id, []) if expires > now]
+        # 예약이 없는 영상은 key도 남기지 않음 (매 프레임 available()이 호출되므로)
+        if active:
+            self._reserved[video_id] = active
+        else:
+            self._reserved.pop(video_id, None)
+        return active
+
+    def available(self, video_id, free_boxes):
+        """ 예약되지 않은 빈칸만 반환 """
+        with self._lock:
+            return self._filter(video_id, free_boxes, time.time())
+
+    def _filter(self, video_id, free_boxes, now):
+        active = self._active(video_id, now)
+        if not active or not len(free_boxes):
+            return list(free_boxes)
+
+        reserved_centers = np.array([center for center, _ in active])
+        near = distance_matrix(box_centers(free_boxes), reserved_centers).min(axis=1) <= self.radius
+        return [box for box, taken in zip(free_boxes, near) if not taken]
+
+    def assign(self, video_id, points, free_boxes, reserve=True, method="auto"):
+        """ 예약 안 된 빈칸 중에서 배정하고, reserve=True면 배정 결과를 바로 예약 (한 번에 처리) """
+        with self._lock:
+            now = time.time()
+            assignments = assign_spots(points, self._filter(video_id, free_boxes, now), method)
+            if reserve:
+                expires = now + self.ttl_seconds
+                reserved = [(center, expires) for center, _ in assignments if center]
+                if reserved:
+                    self._reserved.setdefault(video_id, []).extend(reserved)
+            return assignments
+
+    def release(self, video_id, center):
+        """ center에서 radius 안의 예약 해제 -> 해제한 예약 수 """
+        with self._lock:
+            reserved = self._reserved.get(video_id)
+            if not reserved:
+                return 0
+            kept = [(c, expires) for c, expires in reserved
+                    if np.hypot(c[0] - center[0], c[1] - center[1]) > self.radius]
+            if kept:
+                self._reserved[video_id] = kept
+            else:
+                del self._reserved[video_id]
+            return len(reserved) - len(kept)
+
+    def clear(self, video_id):
+        """ 영상의 예약 전체 삭제 (분석 결과가 삭제된 경우) """
+        with self._lock:
+            self._reserved.pop(video_id, None)
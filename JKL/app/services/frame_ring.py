@@ -0,0 +1,105 @@
+import queue
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+class FrameRing:
+    """
+    공유 메모리에 고정 크기 프레임 slot을 N개 만들어 프로세스 간에 복사 없이 프레임 전달
+    - 프레임 자체는 공유 메모리에 두고, 큐로는 작은 descriptor (slot 번호, frame 번호, meta)만 보냄
+    - 생산자: slot = acquire() -> view(slot)에 직접 쓰기 (cap.read(view)) -> publish(slot, frame_idx)
+    - 소비자: slot, frame_idx, meta = get() -> view(slot) 사용 -> 다 쓰면 release(slot)
+    - 자식 프로세스에 그대로 넘기면 (pickle) 같은 공유 메모리에 다시 연결됨
+    """
+
+    def __init__(self, shape, num_slots=8, dtype=np.uint8, ctx=None):
+        ctx = ctx or mp.get_context("spawn")
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.num_slots = num_slots
+
+        slot_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=slot_bytes * num_slots)
+        self._owner = True
+        self.frames = np.ndarray((num_slots, *self.shape), dtype=self.dtype, buffer=self._shm.buf)
+
+        self._free = ctx.Queue()
+        self._ready = ctx.Queue()
+        for slot in range(num_slots):
+            self._free.put(slot)
+
+    def __getstate__(self):
+        return {
+            "shape": self.shape, "dtype": self.dtype.str, "num_slots": self.num_slots,
+            "name": self._shm.name, "free": self._free, "ready": self._ready,
+        }
+
+    def __setstate__(self, state):
+        self.shape = state["shape"]
+        self.dtype = np.dtype(state["dtype"])
+        self.num_slots = state["num_slots"]
+        self._shm = shared_memory.SharedMemory(name=state["name"])
+        self._owner = False
+        self.frames = np.ndarray((self.num_slots, *self.shape), dtype=self.dtype, buffer=self._shm.buf)
+        self._free = state["free"]
+        self._ready = state["ready"]
+
+    def view(self, slot, shape=None):
+        """ slot의 프레임 배열 (복사 없는 view). shape을 주면 slot 앞부분을 그 크기의 연속 배열로 사용 (더 작은 프레임) """
+        if shape is None or tuple(shape) == self.shape:
+            return self.frames[slot]
+        size = int(np.prod(shape))
+        if size > self.frames[slot].size:
+            raise ValueError(f"프레임 {tuple(shape)}가 slot {self.shape}보다 큽니다.")
+        return self.frames[slot].reshape(-1)[:size].reshape(shape)
+
+    def acquire(self, timeout=None):
+        """ 비어 있는 slot 번호 (모든 slot이 사용 중이면 기다림, timeout이 지나면 None) """
+        try:
+            return self._free.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def publish(self, slot, frame_idx, meta=None):
+        self._ready.put((slot, frame_idx, meta))
+
+    def write(self, frame, frame_idx, meta=None, timeout=None):
+        """ 이미 디코딩된 프레임을 복사해서 넣는 경우 (가능하면 view에 직접 디코딩하는 편이 빠름) """
+        slot = self.acquire(timeout)
+        if slot is None:
+            return None
+        np.copyto(self.frames[slot], frame)
+        self.publish(slot, frame_idx, meta)
+        return slot
+
+    def get(self, timeout=None):
+        """ 다음 프레임 descriptor (slot, frame_idx, meta). 생산자가 끝났거나 timeout이면 None """
+        try:
+            return self._ready.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, slot):
+        """ 다 쓴 slot 반환 -> 생산자가 다시 사용 """
+        self._free.put(slot)
+
+    def cancel_acquire(self):
+        """ acquire에서 기다리는 생산자를 깨움 (acquire가 None 반환) """
+        self._free.put(None)
+
+    def close_producer(self, num_consumers=1):
+        """ 소비자 수만큼 종료 신호 전송 """
+        for _ in range(num_consumers):
+            self._ready.put(None)
+
+    def close(self):
+        """ 공유 메모리 연결 해제 (만든 프로세스는 메모리 자체도 삭제) """
+        self.frames = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # 밖에서 아직 view를 잡고 있으면 그 view가 사라질 때 해제됨
+            pass
+        if self._owner:
+            self._shm.unlink()
@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import queue
+import threading
+import multiprocessing as mp
+from pathlib import Path
+
+import numpy as np
+
+# 주차장 단위 설정 (없으면 다중 카메라 기능 비활성)
+LOT_CONFIG_PATH = Path(os.environ.get("PARKING_LOT_CONFIG", "app/resources/lot.json"))
+
+# 스트림이 끊기면 1, 2, 4, ... 최대 RECONNECT_MAX_SECONDS 간격으로 다시 연결
+RECONNECT_BASE_SECONDS = 1.0
+RECONNECT_MAX_SECONDS = 30.0
+# 워커 프로세스가 메시지 없이 죽으면 (OOM, segfault 등) 같은 backoff로 최대 MAX_RESTARTS번 다시 시작
+MAX_RESTARTS = int(os.environ.get("PARKING_CAMERA_MAX_RESTARTS", 5))
+
+def backoff_seconds(attempt):
+    return min(RECONNECT_BASE_SECONDS * 2 ** max(attempt - 1, 0), RECONNECT_MAX_SECONDS)
+
+def load_lot_config(path=LOT_CONFIG_PATH):
+    """
+    lot.json 예:
+        {
+          "slots": {"A-01": {"x": 12.5, "y": 3.0}, "A-02": {"x": 15.0, "y": 3.0}},
+          "cameras": {
+            "cam-1": {"source": "rtsp://10.0.0.11/stream", "stride": 15,
+                      "slots": {"A-01": [[100, 400], [220, 400], [230, 520], [95, 520]], ...}},
+            "cam-2": {"source": "videos/cam2.mp4", "slots": {"A-02": [...], "A-01": [...]}}
+          }
+        }
+    - slots: 주차장 공통 slot ID와 주차장 좌표 (추천 거리 계산용)
+    - cameras.*.slots: 카메라 화면에서 각 slot의 다각형 (같은 slot이 여러 카메라에 있어도 됨)
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    with path.open(encoding="utf-8") as f:
+        return json.load(f)
+
+def slot_states(detections, slot_polygons):
+    """
+    한 프레임의 탐지 결과 -> slot별 (free 여부, 신뢰도)
+    slot 다각형 안에 중심이 있는 박스 중 신뢰도가 가장 높은 박스의 클래스를 사용 (박스가 없으면 판단 보류)
+    """
+    import cv2
+
+    states = {}
+    for slot_id, polygon in slot_polygons.items():
+        contour = np.asarray(polygon, dtype=np.float32).reshape(-1, 1, 2)
+        best = None
+        for x1, y1, x2, y2, conf, label in detections:
+            center = ((x1 + x2) / 2, (y1 + y2) / 2)
+            if cv2.pointPolygonTest(contour, center, False) >= 0 and (best is None or conf > best[1]):
+                best = (label == "free", conf)
+        if best is not None:
+            states[slot_id] = best
+    return states
+
+def camera_worker(camera_id, camera_config, model_path, result_queue, stop_event):
+    """ 카메라 한 대를 맡는 프로세스: stride 프레임마다 탐지 후 slot 상태를 coordinator로 전송 """
+    import cv2
+    from models.model_loader import load_yolo_model
+
+    model = load_yolo_model(model_path)
+    if model is None:
+        result_queue.put(("error", camera_id, "YOLO 모델 로드 실패"))
+        return
+
+    source = camera_config["source"]
+    cap = cv2.VideoCapture(source)
+    is_file = Path(source).is_file()  # 영상 파일은 끝까지 읽으면 종료, 스트림은 끊겨도 다시 연결
+    stride = camera_config.get("stride", 15)
+    slot_polygons = camera_config["slots"]
+    frame_idx = 0
+    failures = 0
+
+    print(f"✅ 카메라 워커 시작: {camera_id}")
+    result_queue.put(("running", camera_id))
+    while not stop_event.is_set():
+        ret, frame = cap.read()
+        if not ret:
+            if is_file:
+                break
+            failures += 1
+            delay = backoff_seconds(failures)
+            print(f"❌ 카메라 프레임 읽기 실패: {camera_id} ({failures}회), {delay:.0f}초 후 다시 연결")
+            result_queue.put(("reconnecting", camera_id))
+            cap.release()
+            # stop_event.wait()는 대기 중 프로세스가 죽으면 set()이 멈출 수 있어서 짧게 나눠서 확인
+            deadline = time.monotonic() + delay
+            while time.monotonic() < deadline and not stop_event.is_set():
+                time.sleep(0.1)
+            cap = cv2.VideoCapture(source)
+            continue
+        if failures:
+            failures = 0
+            print(f"✅ 카메라 다시 연결됨: {camera_id}")
+            result_queue.put(("running", camera_id))
+
+        if frame_idx % stride == 0:
+            results = model(frame, verbose=False)[0]
+            detections = [
+                (*map(float, box), float(conf), model.names.get(int(cls), "Unknown"))
+                for box, conf, cls in zip(results.boxes.xyxy.cpu().numpy(),
+                                          results.boxes.conf.cpu().numpy(),
+                                          results.boxes.cls.cpu().numpy())
+            ]
+            result_queue.put(("states", camera_id, time.time(), slot_states(detections, slot_polygons)))
+        frame_idx += 1
+
+    cap.release()
+    result_queue.put(("done", camera_id))
+    print(f"✅ 카메라 워커 종료: {camera_id}")
+
+class LotCoordinator:
+    """
+    카메라별 워커 프로세스의 slot 상태를 합쳐서 주차장 전체 빈자리 인덱스 유지
+    - 같은 slot을 여러 카메라가 보면 최근(stale_seconds 이내) 관측의 신뢰도 합으로 투표, 동점이면 점유로 봄
+    - 메시지 없이 죽은 워커는 backoff 후 다시 시작 (MAX_RESTARTS번 넘으면 "dead")
+    """
+
+    def __init__(self, config, model_path=None, stale_seconds=30.0):
+        self.config = config
+        self.model_path = model_path
+        self.stale_seconds = stale_seconds
+
+        self.slot_ids = list(config["slots"])
+        self._slot_index = {slot_id: i for i, slot_id in enumerate(self.slot_ids)}
+        self.positions = np.array([[config["slots"][s]["x"], config["slots"][s]["y"]] for s in self.slot_ids],
+                                  dtype=np.float64).reshape(-1, 2)
+        self.free_mask = np.zeros(len(self.slot_ids), dtype=bool)
+        self.known_mask = np.zeros(len(self.slot_ids), dtype=bool)
+
+        self._observations = {slot_id: {} for slot_id in self.slot_ids}  # slot -> camera -> (free, conf, ts)
+        self.camera_status = {camera_id: "stopped" for camera_id in config["cameras"]}
+        self._lock = threading.Lock()
+
+        self._ctx = mp.get_context("spawn")
+        self._queue = None
+        self._stop_event = None
+        self._processes = {}
+        self._restarts = {camera_id: 0 for camera_id in config["cameras"]}
+        self._restart_at = {}  # camera_id -> 다시 시작할 시각
+        self._collector = None
+
+    def start(self):
+        self._queue = self._ctx.Queue()
+        self._stop_event = self._ctx.Event()
+        for camera_id in self.config["cameras"]:
+            self._start_worker(camera_id)
+
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def _start_worker(self, camera_id):
+        from models.model_loader import MODEL_PATH
+
+        process = self._ctx.Process(target=camera_worker, daemon=True, name=f"camera-{camera_id}",
+                                    args=(camera_id, self.config["cameras"][camera_id], self.model_path or MODEL_PATH,
+                                          self._queue, self._stop_event))
+        process.start()
+        self._processes[camera_id] = process
+        self.camera_status[camera_id] = "starting"
+
+    def stop(self, timeout=5.0):
+        if self._stop_event is not None:
+            self._stop_event.set()
+        for process in self._processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes.clear()
+
+    def _collect(self):
+        last_check = time.monotonic()
+        while self._processes or not self._queue.empty():
+            try:
+                self._handle(self._queue.get(timeout=1.0))
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    break
+            if time.monotonic() - last_check >= 1.0:
+                self._check_workers()
+                last_check = time.monotonic()
+
+    def _handle(self, message):
+        kind, camera_id = message[0], message[1]
+        if kind == "states":
+            self.update(camera_id, message[2], message[3])
+        elif kind in ("running", "reconnecting"):
+            self.camera_status[camera_id] = kind
+        elif kind == "error":
+            print(f"❌ 카메라 워커 오류: {camera_id}: {message[2]}")
+            self.camera_status[camera_id] = "error"
+        elif kind == "done":
+            self.camera_status[camera_id] = "finished"
+
+    def _check_workers(self):
+        """ 종료 메시지 없이 죽은 워커 확인 -> backoff 후 다시 시작 """
+        if self._stop_event.is_set():
+            return
+        # 죽기 직전에 보낸 메시지("done", "error")가 큐에 남아 있을 수 있으므로 먼저 처리
+        while True:
+            try:
+                self._handle(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        now = time.monotonic()
+        for camera_id, process in list(self._processes.items()):
+            if process.exitcode is None or self.camera_status[camera_id] in ("finished", "error", "dead"):
+                continue
+            if camera_id not in self._restart_at:
+                self._restarts[camera_id] += 1
+                if self._restarts[camera_id] > MAX_RESTARTS:
+                    print(f"❌ 카메라 워커 재시작 포기: {camera_id} (exitcode={process.exitcode})")
+                    self.camera_status[camera_id] = "dead"
+                    continue
+                delay = backoff_seconds(self._restarts[camera_id])
+                print(f"❌ 카메라 워커 종료됨: {camera_id} (exitcode={process.exitcode}), {delay:.0f}초 후 재시작")
+                self.camera_status[camera_id] = "restarting"
+                self._restart_at[camera_id] = now + delay
+            elif now >= self._restart_at[camera_id]:
+                del self._restart_at[camera_id]
+                self._start_worker(camera_id)
+
+    def update(self, camera_id, timestamp, states):
+        """ 카메라 한 대의 slot 상태 반영 후 해당 slot들만 다시 합침 """
+        with self._lock:
+            for slot_id, (free, conf) in states.items():
+                if slot_id not in self._observations:
+                    continue
+                self._observations[slot_id][camera_id] = (free, conf, timestamp)
+                self._fuse(slot_id, time.time())
+
+    def _fuse(self, slot_id, now):
+        votes = [(free, conf) for free, conf, ts in self._observations[slot_id].values()
+                 if now - ts <= self.stale_seconds]
+        i = self._slot_index[slot_id]
+        self.known_mask[i] = bool(votes)
+        free_score = sum(conf for free, conf in votes if free)
+        occupied_score = sum(conf for free, conf in votes if not free)
+        self.free_mask[i] = bool(votes) and free_score > occupied_score
+
+    def refresh(self):
+        """ 오래된 관측을 빼고 전체 slot 다시 합침 (카메라가 멈춘 경우 대비) """
+        with self._lock:
+            now = time.time()
+            for slot_id in self.slot_ids:
+                self._fuse(slot_id, now)
+
+    def nearest_free(self, x, y):
+        """ find_nearest_parking_space와 같은 의미: 가장 가까운 빈 slot -> (slot_id, 좌표, 거리) """
+        self.refresh()
+        with self._lock:
+            free_idx = np.nonzero(self.free_mask)[0]
+            if not len(free_idx):
+                return None, None, float("inf")
+            distances = np.linalg.norm(self.positions[free_idx] - np.array([x, y], dtype=np.float64), axis=1)
+            best = int(free_idx[np.argmin(distances)])
+            return self.slot_ids[best], tuple(self.positions[best].tolist()), float(distances.min())
+
+    def status(self):
+        self.refresh()
+        with self._lock:
+            return {
+                "cameras": dict(self.camera_status),
+                "total_slots": len(self.slot_ids),
+                "free_slots": [self.slot_ids[i] for i in np.nonzero(self.free_mask)[0]],
+                "occupied_slots": [self.slot_ids[i] for i in np.nonzero(self.known_mask & ~self.free_mask)[0]],
+                "unknown_slots": [self.slot_ids[i] for i in np.nonzero(~self.known_mask)[0]],
+            }
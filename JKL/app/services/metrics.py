@@ -0,0 +1,162 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# 프로세스 시작 시각 근사값 (앱 import 초반에 이 모듈이 import됨)
+PROCESS_START = time.perf_counter()
+
+# 단계별 소요 시간 버킷 (초)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+class _Metric:
+    """ Prometheus text format으로 내보내는 메트릭 공통 부분 (라벨 조합별 값 저장) """
+    kind = ""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_format_labels(key)} {value}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def _render_value(self, key, state):
+        lines = []
+        for bound, count in zip(self.buckets, state["buckets"]):
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', str(bound)),))} {count}")
+        lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {state['count']}")
+        lines.append(f"{self.name}_sum{_format_labels(key)} {state['sum']}")
+        lines.append(f"{self.name}_count{_format_labels(key)} {state['count']}")
+        return lines
+
+REGISTRY = []
+
+STAGE_SECONDS = Histogram("parking_stage_seconds", "Time spent per processing stage", labelnames=("stage",))
+JOB_SECONDS = Histogram("parking_job_seconds", "Total time per video job",
+                        buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800))
+JOBS_IN_PROGRESS = Gauge("parking_jobs_in_progress", "Video jobs waiting or running")
+JOBS_TOTAL = Counter("parking_jobs_total", "Finished video jobs", labelnames=("status",))
+FRAMES_TOTAL = Counter("parking_frames_total", "Processed frames")
+MODEL_LOAD_SECONDS = Gauge("parking_model_load_seconds", "Time taken to load a model", labelnames=("model",))
+WARMUP_SECONDS = Gauge("parking_model_warmup_seconds", "Model load plus first dummy inference")
+FIRST_INFERENCE_SECONDS = Gauge("parking_time_to_first_inference_seconds",
+                                "Seconds from process start to the first successful inference")
+
+def render_metrics():
+    """ 등록된 모든 메트릭을 Prometheus text format으로 """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+class JobTrace:
+    """ 작업 하나의 프레임별 단계 소요 시간 기록 (요청 시에만 사용) """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.started_at = time.time()
+        self.frames = []
+
+    def new_frame(self, frame_idx):
+        self.frames.append({"frame": frame_idx})
+
+    def add(self, stage, seconds):
+        if self.frames:
+            frame = self.frames[-1]
+            frame[stage] = frame.get(stage, 0.0) + seconds
+
+    def summary(self):
+        totals = {}
+        for frame in self.frames:
+            for stage, seconds in frame.items():
+                if stage != "frame":
+                    totals[stage] = totals.get(stage, 0.0) + seconds
+        return {"job_id": self.job_id, "frames": len(self.frames), "stage_totals_seconds": totals}
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({**self.summary(), "started_at": self.started_at, "per_frame": self.frames}, f)
+
+def observe_stage(stage, seconds, trace=None):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if trace is not None:
+        trace.add(stage, seconds)
+
+# ultralytics Results.speed 키 -> 단계 이름
+YOLO_SPEED_STAGES = (("preprocess", "preprocess"), ("inference", "inference"), ("nms", "postprocess"))
+
+def observe_yolo_speed(result, trace=None):
+    """ ultralytics가 측정한 단계별 시간 (ms) 기록, result는 Results 또는 speed dict """
+    speed = getattr(result, "speed", result)
+    for stage, key in YOLO_SPEED_STAGES:
+        observe_stage(stage, speed[key] / 1000, trace)
+
+@contextmanager
+def timed(stage, trace=None):
+    """ with timed("decode"): ... -> 단계 히스토그램(+ trace)에 기록 """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, trace)
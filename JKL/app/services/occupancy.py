@@ -0,0 +1,150 @@
+import json
+import threading
+
+import cv2
+import numpy as np
+
+# 점유 시간 히스토그램 구간 (초)
+DWELL_BINS = (0, 60, 300, 900, 1800, 3600, 4 * 3600, float("inf"))
+
+# heatmap PNG 가로 크기 (요청한 max_width 이하 중 가장 큰 값으로 맞춤 -> 영상당 캐시는 최대 이 개수)
+HEATMAP_WIDTHS = (160, 320, 480, 640, 960, 1280, 1920)
+
+def heatmap_width(max_width):
+    return max((w for w in HEATMAP_WIDTHS if w <= max_width), default=HEATMAP_WIDTHS[0])
+
+class OccupancyAccumulator:
+    """
+    영상 처리 중 프레임마다 갱신하는 점유 통계 (영상을 다시 디코딩하지 않고 대시보드에서 조회)
+    - heatmap: cell x cell 픽셀 단위로 점유 박스가 덮은 프레임 수
+    - slot별 (DeepSORT track ID 기준) 점유율, 빈칸 -> 점유 전환 횟수(turnover), 점유 지속 시간(dwell)
+    """
+
+    def __init__(self, width, height, fps, cell=8):
+        self.width = width
+        self.height = height
+        self.fps = fps or 30.0
+        self.cell = cell
+        self.grid = np.zeros((-(-height // cell), -(-width // cell)), dtype=np.float32)
+
+        self.frames = 0
+        self.occupied_ratio_sum = 0.0
+        self.current = {"free": 0, "occupied": 0}
+        self.slots = {}  # track_id -> {"label", "run_start", "seen", "occupied"}
+        self.turnovers = 0
+        self.dwell_seconds = []
+        self.finished = False
+
+        self._lock = threading.Lock()
+        self._png_cache = {}  # HEATMAP_WIDTHS 중 하나 -> (frames, png bytes)
+
+    def update(self, frame_idx, detections):
+        """ detect_and_track이 만든 annotation["detections"] 반영 """
+        with self._lock:
+            free = occupied = 0
+            for det in detections:
+                is_free = det["label"] == "free"
+                if is_free:
+                    free += 1
+                else:
+                    occupied += 1
+                    x1, y1, x2, y2 = (max(0, v) // self.cell for v in det["bbox"])
+                    self.grid[y1:y2 + 1, x1:x2 + 1] += 1
+
+                if det.get("track_id") is not None:
+                    self._update_slot(str(det["track_id"]), "free" if is_free else "occupied", frame_idx)
+
+            self.frames += 1
+            self.current = {"free": free, "occupied": occupied}
+            if free + occupied:
+                self.occupied_ratio_sum += occupied / (free + occupied)
+
+    def _update_slot(self, track_id, label, frame_idx):
+        slot = self.slots.get(track_id)
+        if slot is None:
+            self.slots[track_id] = {"label": label, "run_start": frame_idx, "seen": 1,
+                                    "occupied": int(label == "occupied")}
+            return
+
+        slot["seen"] += 1
+        slot["occupied"] += int(label == "occupied")
+        if label == slot["label"]:
+            return
+
+        if label == "occupied":
+            self.turnovers += 1
+        else:
+            self.dwell_seconds.append((frame_idx - slot["run_start"]) / self.fps)
+        slot["label"] = label
+        slot["run_start"] = frame_idx
+
+    def finish(self):
+        with self._lock:
+            self.finished = True
+
+    def heatmap_png(self, max_width=480):
+        """ 점유 비율 heatmap (컬러맵 PNG), 새 프레임이 반영된 경우에만 다시 인코딩 """
+        max_width = heatmap_width(max_width)
+        with self._lock:
+            cached = self._png_cache.get(max_width)
+            if cached and cached[0] == self.frames:
+                return cached[1]
+
+            ratio = self.grid / max(self.frames, 1)
+            image = cv2.applyColorMap((np.clip(ratio, 0, 1) * 255).astype(np.uint8), cv2.COLORMAP_JET)
+            if image.shape[1] > max_width:
+                height = max(1, round(image.shape[0] * max_width / image.shape[1]))
+                image = cv2.resize(image, (max_width, height), interpolation=cv2.INTER_AREA)
+            else:
+                # cell 단위 격자를 원본 비율에 맞게 확대 (max_width 이내)
+                scale = max(1, min(self.cell, max_width // image.shape[1]))
+                image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST)
+
+            _, buffer = cv2.imencode(".png", image)
+            png = buffer.tobytes()
+            self._png_cache[max_width] = (self.frames, png)
+            return png
+
+    def summary(self, top_slots=20):
+        with self._lock:
+            now_frame = self.frames
+            # 아직 점유 중인 slot의 현재까지 점유 시간도 포함
+            active = [(now_frame - s["run_start"]) / self.fps for s in self.slots.values() if s["label"] == "occupied"]
+            dwell = np.array(self.dwell_seconds + active, dtype=np.float64)
+            counts, _ = np.histogram(dwell, bins=DWELL_BINS)
+
+            utilization = sorted(
+                ({"track_id": track_id, "utilization": s["occupied"] / s["seen"], "seen_frames": s["seen"],
+                  "state": s["label"]} for track_id, s in self.slots.items()),
+                key=lambda item: item["utilization"], reverse=True,
+            )
+
+            return {
+                "status": "finished" if self.finished else "processing",
+                "frames": self.frames,
+                "duration_seconds": self.frames / self.fps,
+                "mean_occupancy": self.occupied_ratio_sum / self.frames if self.frames else None,
+                "current": dict(self.current),
+                "tracked_slots": len(self.slots),
+                "turnovers": self.turnovers,
+                "dwell_seconds": {
+                    "bins": [b if b != float("inf") else None for b in DWELL_BINS],
+                    "counts": counts.tolist(),
+                    "completed": len(self.dwell_seconds),
+                    "active": len(active),
+                    "p50": float(np.percentile(dwell, 50)) if len(dwell) else None,
+                    "p95": float(np.percentile(dwell, 95)) if len(dwell) else None,
+                },
+                "slots": utilization[:top_slots],
+            }
+
+def accumulator_from_sidecar(sidecar_path, cell=8):
+    """ 메모리에 없는 (서버 재시작 전에 끝난) 작업은 sidecar를 다시 읽어서 복원 """
+    with open(sidecar_path, encoding="utf-8") as sidecar:
+        header = json.loads(sidecar.readline())
+        accumulator = OccupancyAccumulator(header["width"], header["height"], header["fps"], cell)
+        for line in sidecar:
+            annotation = json.loads(line)
+            accumulator.update(annotation["frame"], annotation["detections"])
+    accumulator.finish()
+    return accumulator
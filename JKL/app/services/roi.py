@@ -0,0 +1,194 @@
+import os
+import json
+import threading
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# 카메라별 ROI 설정 파일 (없으면 기존처럼 전체 프레임 추론)
+ROI_CONFIG_PATH = Path(os.environ.get("PARKING_ROI_CONFIG", "app/resources/rois.json"))
+PAD_VALUE = 114  # ultralytics letterbox와 같은 회색
+
+def load_polygons_from_xml(xml_path):
+    """ xml_overay.py와 같은 형식(<space><contour><point x= y=/>)의 주차칸 윤곽선 -> 다각형 리스트 """
+    root = ET.parse(xml_path).getroot()
+    polygons = []
+    for contour in root.findall('.//space/contour'):
+        points = [(float(point.get('x')), float(point.get('y'))) for point in contour.findall('point')]
+        if len(points) >= 3:
+            polygons.append(points)
+    return polygons
+
+class CameraROI:
+    """
+    카메라 한 대의 관심 영역 (다각형 여러 개)
+    - ROI를 덮는 타일만 원본 해상도 그대로 잘라서 추론 (먼 주차칸이 축소되지 않음, 하늘/도로 등은 건너뜀)
+    - 타일 경계의 중복 탐지는 NMS로 합침
+    - 같은 카메라의 작업 여러 개가 동시에 써도 되도록 프레임 크기별 (마스크, 타일)은 만든 뒤 바꾸지 않음
+    """
+
+    def __init__(self, polygons, tile_size=640, overlap=0.2, margin=16):
+        self.polygons = [np.asarray(p, dtype=np.float32) for p in polygons]
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.margin = margin  # 다각형 경계에 걸친 차량/주차칸이 잘리지 않도록 마스크를 약간 넓힘
+        self._layouts = {}  # (h, w) -> (mask, tiles)
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # 탐지 워커 프로세스로 넘길 때 lock은 제외 (자식 프로세스에서 새로 만듦)
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def prepare(self, frame_shape):
+        """ 프레임 크기에 맞는 (마스크, 타일 목록), 크기별로 한 번만 계산 """
+        key = tuple(frame_shape[:2])
+        with self._lock:
+            layout = self._layouts.get(key)
+            if layout is None:
+                layout = self._layouts[key] = self._build_layout(*key)
+        return layout
+
+    def _build_layout(self, h, w):
+        mask = np.zeros((h, w), dtype=np.uint8)
+        cv2.fillPoly(mask, [p.round().astype(np.int32) for p in self.polygons], 1)
+        if self.margin:
+            kernel = np.ones((2 * self.margin + 1, 2 * self.margin + 1), dtype=np.uint8)
+            mask = cv2.dilate(mask, kernel)
+        mask = mask.astype(bool)
+        mask.setflags(write=False)
+
+        ys, xs = np.nonzero(mask)
+        if not len(xs):
+            return mask, ()
+
+        x_min, x_max, y_min, y_max = xs.min(), xs.max() + 1, ys.min(), ys.max() + 1
+        size = self.tile_size
+        stride = max(1, int(size * (1 - self.overlap)))
+
+        def starts(lo, hi, limit):
+            if hi - lo <= size:
+                return [max(0, min(lo, limit - size))]
+            positions = list(range(lo, hi - size, stride)) + [hi - size]
+            return [max(0, min(p, limit - size)) for p in positions]
+
+        tiles = []
+        for y in starts(y_min, y_max, h):
+            for x in starts(x_min, x_max, w):
+                x2, y2 = min(x + size, w), min(y + size, h)
+                tile_mask = mask[y:y2, x:x2]
+                if tile_mask.any():
+                    # 타일 전체가 ROI 안이면 마스킹 생략
+                    tiles.append((x, y, x2, y2, None if tile_mask.all() else tile_mask))
+        return mask, tuple(tiles)
+
+    @staticmethod
+    def crops(frame, tiles):
+        """ ROI 타일 crop (ROI 밖 픽셀은 회색으로 가림) """
+        crops = []
+        for x1, y1, x2, y2, tile_mask in tiles:
+            crop = frame[y1:y2, x1:x2]
+            if tile_mask is not None:
+                crop = crop.copy()
+                crop[~tile_mask] = PAD_VALUE
+            crops.append(crop)
+        return crops
+
+    @staticmethod
+    def contains(mask, points):
+        """ (N, 2) 좌표가 ROI(여유 포함) 안인지 """
+        points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+        h, w = mask.shape
+        xs = np.clip(points[:, 0], 0, w - 1)
+        ys = np.clip(points[:, 1], 0, h - 1)
+        return mask[ys, xs]
+
+def nms_per_class(boxes, confs, class_ids, iou_threshold=0.5):
+    """ 클래스별 NMS (타일 겹침 영역에서 생긴 중복 박스 제거) -> 남길 인덱스 """
+    keep = []
+    for class_id in np.unique(class_ids):
+        idx = np.nonzero(class_ids == class_id)[0]
+        xywh = [[float(x1), float(y1), float(x2 - x1), float(y2 - y1)] for x1, y1, x2, y2 in boxes[idx]]
+        kept = cv2.dnn.NMSBoxes(xywh, confs[idx].astype(float).tolist(), 0.0, iou_threshold)
+        keep.extend(idx[np.asarray(kept, dtype=int).reshape(-1)])
+    return np.sort(np.asarray(keep, dtype=int))
+
+def tile_batch_size(model):
+    """
+    한 번에 추론할 수 있는 타일 수 (None이면 제한 없음)
+    export_models.py로 만든 .onnx 등은 batch 1 고정 그래프(dynamic=False)이므로 1
+    """
+    weights = getattr(model, "model", None)  # ultralytics: .pt는 nn.Module, export된 모델은 파일 경로
+    if isinstance(weights, (str, Path)) and Path(weights).suffix != ".pt":
+        return 1
+    return None
+
+def detect_tiled(model, frame, roi, iou_threshold=0.5):
+    """
+    ROI 타일만 추론 (가능하면 한 번에 batch로) 후 원본 좌표로 합침
+    반환: boxes (N, 4) xyxy, confs (N,), class_ids (N,), speed (단계별 ms 합계)
+    """
+    # 이 프레임 크기의 (마스크, 타일)을 한 번 받아서 끝까지 사용 (다른 작업이 바꾸지 않음)
+    mask, tiles = roi.prepare(frame.shape)
+    crops = roi.crops(frame, tiles)
+    speed = {"preprocess": 0.0, "inference": 0.0, "postprocess": 0.0}
+    if not crops:
+        return np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=int), speed
+
+    batch = tile_batch_size(model) or len(crops)
+    results = [result for i in range(0, len(crops), batch) for result in model(crops[i:i + batch], verbose=False)]
+
+    all_boxes, all_confs, all_classes = [], [], []
+    for (x1, y1, _, _, _), result in zip(tiles, results):
+        for key in speed:
+            speed[key] += result.speed[key]
+        boxes = result.boxes.xyxy.cpu().numpy()
+        if not len(boxes):
+            continue
+        all_boxes.append(boxes + np.array([x1, y1, x1, y1], dtype=boxes.dtype))
+        all_confs.append(result.boxes.conf.cpu().numpy())
+        all_classes.append(result.boxes.cls.cpu().numpy().astype(int))
+
+    if not all_boxes:
+        return np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=int), speed
+
+    boxes = np.concatenate(all_boxes)
+    confs = np.concatenate(all_confs)
+    class_ids = np.concatenate(all_classes)
+
+    # 중심이 ROI 밖인 박스 제거 후 타일 간 중복 제거
+    centers = np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+    inside = roi.contains(mask, centers)
+    boxes, confs, class_ids = boxes[inside], confs[inside], class_ids[inside]
+
+    keep = nms_per_class(boxes, confs, class_ids, iou_threshold)
+    return boxes[keep], confs[keep], class_ids[keep], speed
+
+_camera_rois = None
+
+def get_camera_roi(camera_id):
+    """
+    설정 파일에서 카메라 ROI 로드 (처음 한 번만 읽음)
+    rois.json 예:
+        {"cam-1": {"polygons": [[[100, 400], [1800, 380], [1900, 1050], [50, 1070]]], "tile_size": 640},
+         "cam-2": {"xml": "app/resources/cam2_spaces.xml", "overlap": 0.25}}
+    """
+    global _camera_rois
+    if _camera_rois is None:
+        _camera_rois = {}
+        if ROI_CONFIG_PATH.exists():
+            with ROI_CONFIG_PATH.open(encoding="utf-8") as f:
+                config = json.load(f)
+            for cam_id, cam in config.items():
+                polygons = cam.get("polygons") or load_polygons_from_xml(cam["xml"])
+                _camera_rois[cam_id] = CameraROI(polygons, tile_size=cam.get("tile_size", 640),
+                                                 overlap=cam.get("overlap", 0.2), margin=cam.get("margin", 16))
+            print(f"✅ ROI 설정 로드: {sorted(_camera_rois)}")
+    return _camera_rois.get(camera_id) if camera_id else None
@@ -0,0 +1,157 @@
+import os
+import time
+import uuid
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+TMP_PREFIX = ".tmp-"
+GB = 1024 ** 3
+DEFAULT_MAX_GB = 20
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+class StorageManager:
+    """ 폴더 하나를 관리하는 용량 제한 저장소 (LRU + TTL 삭제, 사용 중인 파일 보호, 임시 파일 경유 저장) """
+
+    def __init__(self, root, max_bytes, ttl_seconds=None, on_delete=None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.on_delete = on_delete  # 파일이 삭제되면 이름으로 호출 (그 파일에 딸린 메모리 상태 정리용)
+
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()  # name -> [size, 마지막 접근 시각], 오래된 순
+        self._refs = Counter()
+        self.total_bytes = 0
+        self._scan()
+
+    @classmethod
+    def from_env(cls, root, kind, on_delete=None):
+        """
+        환경변수로 용량/보관 기간을 정하는 저장소 (모든 앱이 같은 변수 사용)
+        kind="upload" -> PARKING_UPLOAD_MAX_GB, kind="download" -> PARKING_DOWNLOAD_MAX_GB, 보관 기간은 PARKING_STORAGE_TTL
+        """
+        max_gb = float(os.environ.get(f"PARKING_{kind.upper()}_MAX_GB", DEFAULT_MAX_GB))
+        ttl_seconds = int(os.environ.get("PARKING_STORAGE_TTL", DEFAULT_TTL_SECONDS))
+        return cls(root, max_bytes=int(max_gb * GB), ttl_seconds=ttl_seconds, on_delete=on_delete)
+
+    def _scan(self):
+        """ 기존 파일을 mtime 순으로 등록, 이전 실행에서 남은 임시 파일 삭제 """
+        files = []
+        for path in self.root.iterdir():
+            if not path.is_file():
+                continue
+            if path.name.startswith(TMP_PREFIX):
+                path.unlink(missing_ok=True)
+                continue
+            stat = path.stat()
+            files.append((stat.st_mtime, path.name, stat.st_size))
+
+        for mtime, name, size in sorted(files):
+            self._entries[name] = [size, mtime]
+            self.total_bytes += size
+        self.evict()
+
+    def _check_name(self, name):
+        if not name or Path(name).name != name or name.startswith("."):
+            raise ValueError(f"잘못된 파일 이름: {name}")
+
+    def path(self, name) -> Path:
+        self._check_name(name)
+        return self.root / name
+
+    def exists(self, name) -> bool:
+        try:
+            self._check_name(name)
+        except ValueError:
+            return False
+        with self._lock:
+            return name in self._entries and (self.root / name).exists()
+
+    def touch(self, name) -> Path:
+        """ 읽기 전에 호출: LRU 순서 갱신 후 경로 반환 """
+        path = self.path(name)
+        with self._lock:
+            if name in self._entries:
+                self._entries[name][1] = time.time()
+                self._entries.move_to_end(name)
+        return path
+
+    @contextmanager
+    def atomic_write(self, name):
+        """ 임시 파일 경로를 넘겨주고, 블록이 정상 종료되면 최종 이름으로 교체 (확장자는 유지) """
+        final_path = self.path(name)
+        tmp_path = self.root / f"{TMP_PREFIX}{uuid.uuid4().hex}-{name}"
+        try:
+            yield tmp_path
+            if tmp_path.exists():
+                os.replace(tmp_path, final_path)
+                self._register(name, final_path.stat().st_size)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def _register(self, name, size):
+        with self._lock:
+            if name in self._entries:
+                self.total_bytes -= self._entries[name][0]
+            self._entries[name] = [size, time.time()]
+            self._entries.move_to_end(name)
+            self.total_bytes += size
+            self.evict(keep=name)
+
+    @contextmanager
+    def hold(self, *names):
+        """ 처리 중인 파일은 삭제 대상에서 제외 (참조 카운트) """
+        with self._lock:
+            for name in names:
+                self._refs[name] += 1
+        try:
+            yield [self.touch(name) for name in names]
+        finally:
+            with self._lock:
+                for name in names:
+                    self._refs[name] -= 1
+                    if self._refs[name] <= 0:
+                        del self._refs[name]
+
+    def delete(self, name):
+        with self._lock:
+            entry = self._entries.pop(name, None)
+            if entry is None:
+                return
+            try:
+                (self.root / name).unlink(missing_ok=True)
+            except OSError as e:
+                # 다른 곳에서 열려 있어 지우지 못하면 다음 정리 때 다시 시도
+                print(f"❌ 파일 삭제 실패: {name}: {e}")
+                self._entries[name] = entry
+                self._entries.move_to_end(name, last=False)
+                return
+            self.total_bytes -= entry[0]
+        if self.on_delete is not None:
+            self.on_delete(name)
+
+    def evict(self, keep=None):
+        """ TTL이 지난 파일 삭제 후, 용량을 넘으면 가장 오래전에 쓴 파일부터 삭제 """
+        with self._lock:
+            now = time.time()
+            candidates = [name for name in self._entries if name not in self._refs and name != keep]
+
+            for name in candidates:
+                _, last_access = self._entries[name]
+                expired = self.ttl_seconds is not None and now - last_access > self.ttl_seconds
+                if expired or self.total_bytes > self.max_bytes:
+                    print(f"🗑️ 저장소 정리: {name}")
+                    self.delete(name)
+
+    def usage(self):
+        with self._lock:
+            return {
+                "root": str(self.root),
+                "files": len(self._entries),
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "in_use": sorted(self._refs),
+            }
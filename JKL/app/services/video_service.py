@@ -1,13 +1,115 @@
+import os
 import cv2
+import json
+import time
+import queue
+import threading
+import multiprocessing as mp
 import numpy as np
-from ultralytics import YOLO
-from deep_sort_realtime.deepsort_tracker import DeepSort
+from collections import OrderedDict
+from contextlib import closing, nullcontext
 from pathlib import Path
 
-yolo_model = YOLO("C:\\Users\\user\\Documents\\GitHub\\test\\JKL\\app\\models\\best_3000_xl.pt")
-tracker = DeepSort(max_age=30)
+from models.model_loader import load_yolo_model
+from services.assignment import SpotReservations
+from services.frame_ring import FrameRing
+from services.occupancy import OccupancyAccumulator
+from services.roi import detect_tiled, get_camera_roi
+from services.metrics import (FIRST_INFERENCE_SECONDS, FRAMES_TOTAL, PROCESS_START, WARMUP_SECONDS, observe_yolo_speed,
+                              timed)
 
-def extract_preview_frame(video_path: Path) -> Path:
+# 모델은 import 시점이 아니라 처음 필요할 때 (또는 앱 시작 후 warm_up에서) 로드
+yolo_model = None
+_model_lock = threading.Lock()
+# ultralytics predictor는 thread-safe하지 않으므로 현재 프로세스의 공유 모델은 한 번에 한 스레드만 추론
+# (동시 작업은 run_in_threadpool 스레드에서 실행됨, 워커 프로세스는 각자 모델을 가지므로 lock 불필요)
+_inference_lock = threading.Lock()
+
+# /readyz 에서 사용하는 상태
+readiness = {"ready": False, "error": None, "load_seconds": None, "time_to_first_inference": None}
+
+# 탐지를 별도 프로세스에서 실행할 워커 수 (0이면 현재 프로세스에서 탐지)
+DETECT_WORKERS = int(os.environ.get("PARKING_DETECT_WORKERS", 0))
+# 워커 공유 메모리 frame slot 크기 (가로x세로, 더 큰 영상이 오면 풀을 다시 시작)
+_max_w, _max_h = map(int, os.environ.get("PARKING_DETECT_MAX_FRAME", "1920x1080").lower().split("x"))
+DETECT_MAX_FRAME = (_max_h, _max_w, 3)
+
+# 렌더링 시 허용하는 코덱 (mp4 컨테이너)
+RENDER_CODECS = {"mp4v", "avc1"}
+
+# 영상별 가장 최근 프레임의 빈 주차칸 (처리 중인 영상도 매 프레임 갱신)
+latest_free_boxes = {}
+
+# 배정된 주차칸은 TTL 동안 다른 요청(배치 배정, 클릭 추천 모두)에 다시 배정하지 않음
+reservations = SpotReservations(ttl_seconds=int(os.environ.get("PARKING_RESERVATION_TTL", 300)))
+
+# 영상별 점유 통계 (heatmap, 점유율, turnover, dwell time) - 처리 중에도 조회 가능
+# 처리가 끝난 통계는 최근 OCCUPANCY_CACHE_SIZE개만 메모리에 두고, 나머지는 필요할 때 sidecar에서 복원
+OCCUPANCY_CACHE_SIZE = int(os.environ.get("PARKING_OCCUPANCY_CACHE", 32))
+occupancy = OrderedDict()
+_occupancy_lock = threading.Lock()
+
+def remember_occupancy(video_id, accumulator):
+    with _occupancy_lock:
+        occupancy[video_id] = accumulator
+        occupancy.move_to_end(video_id)
+        finished = [vid for vid, acc in occupancy.items() if acc.finished]
+        for vid in finished[:max(0, len(occupancy) - OCCUPANCY_CACHE_SIZE)]:
+            del occupancy[vid]
+
+def get_occupancy(video_id):
+    with _occupancy_lock:
+        accumulator = occupancy.get(video_id)
+        if accumulator is not None:
+            occupancy.move_to_end(video_id)
+        return accumulator
+
+def forget_video(video_id):
+    """ 영상의 메모리 상태 제거 (sidecar가 삭제되었거나 분석이 실패한 경우) """
+    with _occupancy_lock:
+        occupancy.pop(video_id, None)
+    latest_free_boxes.pop(video_id, None)
+    reservations.clear(video_id)
+
+def get_model():
+    """ YOLO 모델을 한 번만 로드해서 반환 """
+    global yolo_model
+    if yolo_model is None:
+        with _model_lock:
+            if yolo_model is None:
+                start = time.perf_counter()
+                model = load_yolo_model()
+                if model is None:
+                    raise RuntimeError("YOLO 모델 로드 실패")
+                readiness["load_seconds"] = time.perf_counter() - start
+                yolo_model = model
+    return yolo_model
+
+def warm_up(imgsz=640):
+    """ 모델 로드 + 더미 프레임으로 첫 추론 (첫 요청이 느려지지 않도록 앱 시작 직후 백그라운드에서 실행) """
+    try:
+        start = time.perf_counter()
+        if DETECT_WORKERS > 0:
+            # 탐지는 워커 프로세스에서만 하므로 메인 프로세스에는 모델을 올리지 않음
+            get_detection_pool().start()
+            readiness["load_seconds"] = time.perf_counter() - start
+        else:
+            model = get_model()
+            with _inference_lock:
+                model(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), verbose=False)
+
+        from deep_sort_realtime.deepsort_tracker import DeepSort  # noqa: F401  (트래커 import도 미리)
+
+        WARMUP_SECONDS.set(time.perf_counter() - start)
+        readiness["time_to_first_inference"] = time.perf_counter() - PROCESS_START
+        FIRST_INFERENCE_SECONDS.set(readiness["time_to_first_inference"])
+        readiness["ready"] = True
+        print(f"✅ 모델 warm-up 완료 (프로세스 시작 후 {readiness['time_to_first_inference']:.1f}초)")
+    except Exception as e:
+        readiness["error"] = str(e)
+        print(f"❌ 모델 warm-up 실패: {e}")
+
+def extract_preview_frame(video_path: Path, preview_path: Path = None) -> Path:
     """ 1초 프레임 추출 후 저장 """
     cap = cv2.VideoCapture(str(video_path))
     fps = cap.get(cv2.CAP_PROP_FPS)
@@ -17,69 +119,429 @@ def extract_preview_frame(video_path: Path) -> Path:
     ret, frame = cap.read()
 
     if not ret:
+        cap.release()
         return None
     
     frame = cv2.resize(frame, (960, 540))
 
-    preview_path = video_path.with_suffix(".jpg")
+    preview_path = preview_path or video_path.with_suffix(".jpg")
     cv2.imwrite(str(preview_path), frame)
     cap.release()
     return preview_path
 
-def process_video(video_path: Path, video_id: str, clicked_points: dict) -> Path:
-    """ YOLO & DeepSORT 기반 주차 공간 분석 """
+def process_video(video_path: Path, video_id: str, clicked_points: dict, sidecar_path: Path = None, trace=None,
+                  camera_id: str = None) -> Path:
+    """ YOLO & DeepSORT 기반 주차 공간 분석 -> 프레임별 annotation sidecar(jsonl) 저장 (영상 인코딩 없음) """
     cap = cv2.VideoCapture(str(video_path))
     width, height, fps = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), cap.get(cv2.CAP_PROP_FPS)
-    output_path = video_path.with_name(f"processed_{video_path.name}")
+    sidecar_path = sidecar_path or video_path.with_name(f"{video_id}.annotations.jsonl")
+
+    from deep_sort_realtime.deepsort_tracker import DeepSort
+
+    # 영상마다 새 트래커 사용 (다른 영상의 track ID가 섞이지 않도록)
+    tracker = DeepSort(max_age=30)
+
+    # 카메라 ROI가 설정되어 있으면 ROI 타일만 추론
+    roi = get_camera_roi(camera_id)
 
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    out = cv2.VideoWriter(str(output_path), fourcc, fps, (width, height))
+    accumulator = OccupancyAccumulator(width, height, fps)
+    remember_occupancy(video_id, accumulator)
 
+    try:
+        with sidecar_path.open("w", encoding="utf-8") as sidecar:
+            # 첫 줄: 영상 정보, 이후 한 줄에 한 프레임
+            header = {"video_id": video_id, "width": width, "height": height, "fps": fps, "camera_id": camera_id}
+            sidecar.write(json.dumps(header) + "\n")
+
+            if DETECT_WORKERS > 0:
+                frames = get_detection_pool().iter_frames(cap, (height, width, 3), camera_id, trace)
+            else:
+                frames = iter_frames(cap, trace)
+
+            # 중간에 실패해도 바로 닫아서 워커 풀 lock / ring slot을 돌려줌
+            with closing(frames):
+                for frame_idx, frame, detection in frames:
+                    annotation = detect_and_track(frame, video_id, clicked_points, tracker, trace, roi, detection)
+                    annotation["frame"] = frame_idx
+                    with timed("write_annotations", trace):
+                        sidecar.write(json.dumps(annotation, separators=(",", ":")) + "\n")
+                    with timed("occupancy", trace):
+                        accumulator.update(frame_idx, annotation["detections"])
+                    FRAMES_TOTAL.inc()
+    except BaseException:
+        # 실패한 작업은 sidecar가 남지 않으므로 "processing" 상태로 계속 조회되지 않도록 제거
+        forget_video(video_id)
+        raise
+    finally:
+        cap.release()
+
+    accumulator.finish()
+    return sidecar_path
+
+def iter_frames(cap, trace=None):
+    """ 현재 프로세스에서 순서대로 디코딩 -> (frame_idx, frame, None) """
+    frame_idx = 0
     while cap.isOpened():
-        ret, frame = cap.read()
+        if trace is not None:
+            trace.new_frame(frame_idx)
+
+        with timed("decode", trace):
+            ret, frame = cap.read()
         if not ret:
             break
 
-        frame = detect_and_track(frame, video_id, clicked_points)
-        out.write(frame)
+        yield frame_idx, frame, None
+        frame_idx += 1
 
-    cap.release()
-    out.release()
-    return output_path
+def detection_worker(ring, results, model_path):
+    """
+    탐지 워커 프로세스: 모델은 시작할 때 한 번만 로드하고 작업이 바뀌어도 계속 사용
+    공유 메모리 ring의 프레임을 복사 없이 읽어서 탐지 결과만 돌려보냄 -> (kind, frame_idx, slot, payload)
+    """
+    model = load_yolo_model(model_path)
+    if model is None:
+        results.put(("error", None, None, "YOLO 모델 로드 실패"))
+        return
+    try:
+        model(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+    except Exception as e:
+        results.put(("error", None, None, f"warm-up 추론 실패: {e}"))
+        return
+    results.put(("ready", None, None, None))
+
+    while True:
+        item = ring.get()
+        if item is None:
+            break
+        slot, frame_idx, meta = item
+        # slot은 메인 프로세스가 추적까지 끝낸 뒤 반환
+        try:
+            detection = detect(ring.view(slot, meta["shape"]), get_camera_roi(meta["camera_id"]), model)
+        except Exception as e:
+            # 한 프레임이 실패해도 slot은 돌려보내야 메인 프로세스가 멈추지 않음
+            results.put(("error", frame_idx, slot, f"{type(e).__name__}: {e}"))
+            continue
+        results.put(("result", frame_idx, slot, detection))
+    ring.close()
+
+class DetectionPool:
+    """
+    탐지 워커 프로세스 풀 - 앱 시작 시 한 번 띄워서 모델을 올려두고 작업마다 재사용
+    - 프레임은 공유 메모리 FrameRing으로 전달 (slot 크기보다 큰 영상이 오면 더 큰 ring으로 다시 시작)
+    - 한 번에 한 작업만 사용 (다른 작업은 lock에서 대기)
+    - 워커가 하나라도 죽으면 작업은 실패 처리하고 풀을 내림 (다음 작업에서 다시 시작)
+    """
+
+    def __init__(self, workers, max_shape=(1080, 1920, 3), model_path=None):
+        self.workers = workers
+        self.max_shape = tuple(max_shape)
+        self.model_path = model_path
+        self._ctx = mp.get_context("spawn")
+        self._lock = threading.Lock()
+        self._ring = None
+        self._results = None
+        self._processes = []
+
+    def start(self):
+        """ 앱 시작 시 warm-up: 아직 안 떠 있으면 워커 시작 """
+        with self._lock:
+            if self._ring is None:
+                self._start()
+
+    def _start(self, shape=None):
+        """ 워커 시작 후 모든 워커가 모델 로드 + 첫 추론을 끝낼 때까지 대기 """
+        from models.model_loader import MODEL_PATH
+
+        self.shutdown()
+        if shape is not None:
+            self.max_shape = tuple(max(a, b) for a, b in zip(self.max_shape, shape))
+
+        self._ring = FrameRing(self.max_shape, num_slots=2 * self.workers + 2, ctx=self._ctx)
+        self._results = self._ctx.Queue()
+        self._processes = [
+            self._ctx.Process(target=detection_worker, daemon=True, name=f"detect-{i}",
+                              args=(self._ring, self._results, self.model_path or MODEL_PATH))
+            for i in range(self.workers)
+        ]
+        for process in self._processes:
+            process.start()
 
-def detect_and_track(frame, video_id, clicked_points):
-    """ YOLO 객체 탐지 및 사용자의 클릭 정보 반영 """
-    results = yolo_model(frame)[0]
-    bbox_dict = {}
+        try:
+            ready = 0
+            while ready < self.workers:
+                message = self._get()
+                if message is None:
+                    continue
+                if message[0] == "error":
+                    raise RuntimeError(message[3])
+                ready += 1
+        except Exception:
+            self.shutdown()
+            raise
+        print(f"✅ 탐지 워커 {self.workers}개 준비 완료 (frame slot {self.max_shape})")
+
+    def shutdown(self, timeout=5):
+        if self._ring is None:
+            return
+        self._ring.close_producer(len(self._processes))
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._ring.close()
+        self._ring = None
+        self._results = None
+        self._processes = []
+
+    def _get(self, timeout=1.0):
+        """ 워커 결과 하나 (timeout이면 None), 워커가 하나라도 종료되었으면 예외 """
+        dead = [process for process in self._processes if process.exitcode is not None]
+        if dead:
+            raise RuntimeError(f"탐지 워커가 종료되었습니다: {dead[0].name} (exitcode={dead[0].exitcode})")
+        try:
+            return self._results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _fits(self, shape):
+        return self._ring is not None and all(a <= b for a, b in zip(shape, self.max_shape))
+
+    def iter_frames(self, cap, shape, camera_id=None, trace=None):
+        """
+        디코딩(스레드) -> 공유 메모리 ring -> 탐지 워커 N개 -> frame 순서대로 (frame_idx, frame, detection)
+        프레임은 ring slot에 직접 디코딩되고, yield한 프레임의 slot은 다음 프레임으로 넘어갈 때 반환됨
+        """
+        with self._lock:
+            if not self._fits(shape):
+                self._start(shape)
+            yield from self._run(cap, tuple(shape), camera_id, trace)
+
+    def _run(self, cap, shape, camera_id, trace):
+        ring = self._ring
+        meta = {"shape": shape, "camera_id": camera_id}
+        # error는 total보다 먼저 기록됨 (total을 읽은 뒤 error를 보면 항상 최종 값)
+        decoded = {"total": None, "error": None}
+        stop = threading.Event()
+
+        def decode():
+            frame_idx = 0
+            slot = None
+            try:
+                while not stop.is_set():
+                    # ring은 작업이 끝나도 계속 쓰므로 acquire를 깨우는 신호 대신 짧은 timeout으로 stop 확인
+                    slot = ring.acquire(timeout=0.1)
+                    if slot is None:
+                        continue
+                    view = ring.view(slot, shape)
+                    with timed("decode"):
+                        ret, frame = cap.read(view)
+                    if not ret:
+                        break
+                    if not np.shares_memory(frame, view):
+                        view[...] = frame
+                    ring.publish(slot, frame_idx, meta)
+                    slot = None
+                    frame_idx += 1
+            except Exception as e:
+                # 예: 컨테이너 정보와 실제 프레임 크기가 다름 -> 작업 실패로 전달
+                decoded["error"] = e
+            finally:
+                # 워커에 넘기지 못한 slot은 반환 (안 하면 ring slot이 영구히 줄어듦)
+                if slot is not None:
+                    ring.release(slot)
+                decoded["total"] = frame_idx
+
+        decoder = threading.Thread(target=decode, daemon=True)
+        decoder.start()
+
+        pending = {}
+        next_idx = received = 0
+        try:
+            while True:
+                total = decoded["total"]
+                if decoded["error"] is not None:
+                    error = decoded["error"]
+                    raise RuntimeError(f"프레임 {total} 디코딩 실패: {type(error).__name__}: {error}") from error
+                if total is not None and next_idx >= total:
+                    break
+                message = self._get()
+                if message is None:
+                    continue
+                kind, frame_idx, slot, payload = message
+                received += 1
+                if kind == "error":
+                    ring.release(slot)
+                    raise RuntimeError(f"프레임 {frame_idx} 탐지 실패: {payload}")
+
+                # 워커마다 끝나는 순서가 다르므로 frame 순서대로 정렬해서 내보냄 (추적은 순서가 중요)
+                pending[frame_idx] = (slot, payload)
+                while next_idx in pending:
+                    slot, detection = pending.pop(next_idx)
+                    if trace is not None:
+                        trace.new_frame(next_idx)
+                    try:
+                        yield next_idx, ring.view(slot, shape), detection
+                    finally:
+                        ring.release(slot)
+                    next_idx += 1
+        finally:
+            stop.set()
+            decoder.join()
+            for slot, _ in pending.values():
+                ring.release(slot)
+            self._drain(ring, decoded["total"] - received)
+
+    def _drain(self, ring, remaining, timeout=30.0):
+        """ 중간에 멈춘 작업의 프레임을 워커에서 회수 (다음 작업이 같은 ring을 사용), 실패하면 풀을 내림 """
+        deadline = time.perf_counter() + timeout
+        try:
+            while remaining > 0:
+                if time.perf_counter() > deadline:
+                    raise RuntimeError("탐지 워커 응답 없음")
+                message = self._get()
+                if message is None:
+                    continue
+                ring.release(message[2])
+                remaining -= 1
+        except RuntimeError as e:
+            print(f"❌ 탐지 워커 풀 재시작 필요: {e}")
+            self.shutdown()
+
+# DETECT_WORKERS > 0 이면 앱 시작 시(warm_up) 띄우고 모든 작업이 공유
+detection_pool = None
+
+def get_detection_pool():
+    global detection_pool
+    if detection_pool is None:
+        with _model_lock:
+            if detection_pool is None:
+                detection_pool = DetectionPool(DETECT_WORKERS, max_shape=DETECT_MAX_FRAME)
+    return detection_pool
+
+def shutdown_detection_pool():
+    if detection_pool is not None:
+        detection_pool.shutdown()
+
+def detect(frame, roi=None, model=None):
+    """ YOLO 탐지 (ROI가 있으면 타일 추론) -> (boxes, confs, labels, speed) """
+    # model을 넘기지 않으면 모든 작업이 같이 쓰는 전역 모델 -> lock 안에서만 추론
+    lock = _inference_lock if model is None else nullcontext()
+    model = model or get_model()
+    with lock:
+        if roi is not None:
+            boxes, confs, class_ids, speed = detect_tiled(model, frame, roi)
+        else:
+            results = model(frame, verbose=False)[0]
+            boxes = results.boxes.xyxy.cpu().numpy()
+            confs = results.boxes.conf.cpu().numpy()
+            class_ids = results.boxes.cls.cpu().numpy().astype(int)
+            speed = results.speed
+
+    labels = [model.names[int(c)] if int(c) in model.names else "Unknown" for c in class_ids]
+    return boxes, confs, labels, dict(speed)
+
+def detect_and_track(frame, video_id, clicked_points, tracker=None, trace=None, roi=None, detection=None):
+    """ YOLO 객체 탐지 + DeepSORT 추적, 사용자의 클릭 정보 반영 -> 프레임 annotation (dict) """
+    # detection: 탐지 워커에서 이미 계산한 결과 (없으면 여기서 탐지)
+    boxes, confs, labels, speed = detection if detection is not None else detect(frame, roi)
+
+    observe_yolo_speed(speed, trace)
+    detections = []
     free_boxes = []
 
     # YOLO 바운딩 박스에 번호 부여
-    for idx, result in enumerate(results.boxes, start=1):
-        x1, y1, x2, y2 = map(int, result.xyxy[0])
-        conf = float(result.conf[0])
-        class_id = int(result.cls[0])
-        class_name = yolo_model.names[class_id] if class_id in yolo_model.names else "Unknown"
+    for idx, (box, conf, class_name) in enumerate(zip(boxes, confs, labels), start=1):
+        x1, y1, x2, y2 = map(int, box)
+        conf = float(conf)
 
-        bbox_dict[idx] = {"bbox": (x1, y1, x2, y2), "label": class_name, "confidence": conf}
+        detections.append({"id": idx, "bbox": [x1, y1, x2, y2], "label": class_name,
+                           "conf": round(conf, 3), "track_id": None})
 
         if class_name == "free":
             free_boxes.append((x1, y1, x2, y2))
 
-    # 사용자가 선택한 주차 공간 추천
+    # DeepSORT: 이번 프레임에서 매칭된 트랙의 ID를 해당 박스에 기록
+    # 탐지가 없는 프레임도 update해야 트랙이 나이를 먹고 max_age 뒤에 삭제됨
+    if tracker is not None:
+        raw_detections = [([x1, y1, x2 - x1, y2 - y1], d["conf"], d["label"])
+                          for d in detections for x1, y1, x2, y2 in [d["bbox"]]]
+        with timed("tracking", trace):
+            tracks = tracker.update_tracks(raw_detections, frame=frame, others=list(range(len(detections))))
+        for track in tracks:
+            if track.is_confirmed() and track.time_since_update == 0:
+                det_idx = track.get_det_supplementary()
+                if det_idx is not None:
+                    detections[det_idx]["track_id"] = track.track_id
+
+    latest_free_boxes[video_id] = free_boxes
+
+    # 사용자가 선택한 주차 공간 추천 (다른 요청에 예약된 칸은 제외)
+    recommended = None
     if video_id in clicked_points:
         click_x, click_y = clicked_points[video_id]
-        closest_space, _ = find_nearest_parking_space(click_x, click_y, free_boxes)
+        closest_space, _ = find_nearest_parking_space(click_x, click_y, reservations.available(video_id, free_boxes))
         if closest_space:
-            cv2.circle(frame, closest_space, 10, (0, 0, 255), -1)
+            recommended = [int(closest_space[0]), int(closest_space[1])]
+
+    return {"detections": detections, "recommended": recommended}
+
+def draw_annotations(frame, annotation, scale=1.0):
+    """ annotation을 프레임에 그리기 (scale: 원본 대비 출력 해상도 비율) """
+    def s(v):
+        return int(v * scale)
+
+    if annotation["recommended"]:
+        cx, cy = annotation["recommended"]
+        cv2.circle(frame, (s(cx), s(cy)), 10, (0, 0, 255), -1)
 
     # 바운딩 박스와 ID 표시
-    for idx, data in bbox_dict.items():
-        x1, y1, x2, y2 = data["bbox"]
-        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-        cv2.putText(frame, f"#{idx}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
+    for det in annotation["detections"]:
+        x1, y1, x2, y2 = det["bbox"]
+        cv2.rectangle(frame, (s(x1), s(y1)), (s(x2), s(y2)), (0, 255, 0), 2)
+        cv2.putText(frame, f"#{det['id']}", (s(x1), s(y1) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
 
     return frame
 
+def render_video(video_path: Path, sidecar_path: Path, output_path: Path, width: int = None, codec: str = "mp4v") -> Path:
+    """ sidecar annotation을 원본 영상에 그려서 MP4로 인코딩 (요청 시에만 실행) """
+    cap = cv2.VideoCapture(str(video_path))
+
+    with sidecar_path.open(encoding="utf-8") as sidecar:
+        header = json.loads(sidecar.readline())
+        src_w, src_h = header["width"], header["height"]
+
+        # 가로 해상도만 받고 비율 유지 (코덱 호환을 위해 짝수로 맞춤)
+        out_w = min(width, src_w) if width else src_w
+        out_h = int(round(src_h * out_w / src_w))
+        out_w, out_h = out_w - out_w % 2, out_h - out_h % 2
+        if out_w < 2 or out_h < 2:
+            cap.release()
+            raise ValueError(f"출력 해상도가 너무 작습니다: {out_w}x{out_h}")
+        scale = out_w / src_w
+
+        fourcc = cv2.VideoWriter_fourcc(*codec)
+        out = cv2.VideoWriter(str(output_path), fourcc, header["fps"], (out_w, out_h))
+        if not out.isOpened():
+            # 예: opencv-python 기본 빌드에는 avc1(H.264) 인코더가 없음
+            cap.release()
+            raise ValueError(f"영상 인코더를 열 수 없습니다: codec={codec}, {out_w}x{out_h}")
+
+        for line in sidecar:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            with timed("drawing"):
+                if (out_w, out_h) != (src_w, src_h):
+                    frame = cv2.resize(frame, (out_w, out_h), interpolation=cv2.INTER_AREA)
+                frame = draw_annotations(frame, json.loads(line), scale)
+            with timed("encoding"):
+                out.write(frame)
+
+    cap.release()
+    out.release()
+    return output_path
+
 def find_nearest_parking_space(click_x, click_y, free_boxes):
     """ 클릭한 지점과 가장 가까운 'free' 주차 공간 찾기 """
     min_distance = float("inf")
@@ -94,4 +556,4 @@ def find_nearest_parking_space(click_x, click_y, free_boxes):
             min_distance = distance
             closest_center = (center_x, center_y)
 
-    return closest_center, min_distance
\ No newline at end of file
+    return closest_center, min_distance
@@ -0,0 +1,353 @@
+"""
+탐지 모델 / 주차칸 분류 모델 후보들의 정확도 vs 지연시간 평가 (CPU 기준)
+
+사용 예:
+    python benchmark_models.py --candidates candidates.json \
+        --data parking.yaml --images datasets/val/images --clf-data clf-data-holdout \
+        --output results/benchmark.json --min-map 0.6 --min-accuracy 0.97
+
+candidates.json 예:
+    [
+        {"name": "yolo11n-640", "type": "detector", "path": "app/models/yolo11n.pt", "imgsz": 640},
+        {"name": "yolo11x-960", "type": "detector", "path": "app/models/best_3000_xl.pt", "imgsz": 960},
+        {"name": "yolo11x-onnx", "type": "detector", "path": "app/models/best_3000_xl.onnx", "imgsz": 640},
+        {"name": "yolo11x-naive-tiles", "type": "detector", "path": "app/models/best_3000_xl.pt", "tiling": "naive"},
+        {"name": "yolo11x-roi-tiles", "type": "detector", "path": "app/models/best_3000_xl.pt", "tiling": "roi",
+         "camera_id": "cam-1"},
+        {"name": "slot-resnet50", "type": "classifier", "path": "app/models/slot_resnet50.pt"},
+        {"name": "slot-resnet50-int8", "type": "classifier", "path": "app/models/slot_resnet50_int8.onnx"}
+    ]
+
+tiling (탐지 모델, 기본 full): full = 전체 프레임 한 번 추론, naive = 프레임 전체를 타일로 나눠 추론,
+    roi = 카메라 ROI(PARKING_ROI_CONFIG)를 덮는 타일만 추론 (앱과 같은 경로)
+    타일 방식은 mAP(전체 프레임 기준)를 계산하지 않고 지연시간 / 프레임당 타일 수만 비교
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp"}
+CLF_IMAGE_SHAPE = (64, 64)
+
+
+class PeakMemorySampler:
+    """
+    백그라운드 스레드에서 RSS를 주기적으로 읽어 최대값 기록 (psutil 없으면 None)
+    baseline: 시작 직전 RSS (peak - baseline = 이 구간에서 늘어난 메모리)
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = None
+        self.baseline = None
+        self._stop = threading.Event()
+        self._thread = None
+        try:
+            import psutil
+            self._process = psutil.Process(os.getpid())
+        except ImportError:
+            self._process = None
+
+    def __enter__(self):
+        if self._process is not None:
+            self.baseline = self.peak = self._process.memory_info().rss
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._process.memory_info().rss)
+            time.sleep(self.interval)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def list_images(folder, limit=None):
+    paths = sorted(p for p in Path(folder).rglob("*") if p.suffix.lower() in IMAGE_EXTS)
+    return paths[:limit] if limit else paths
+
+
+def latency_stats(latencies):
+    """ 초 단위 지연시간 리스트 -> p50/p95(ms), 처리량(fps) """
+    latencies = np.asarray(latencies)
+    return {
+        "latency_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "latency_p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "throughput_fps": float(len(latencies) / latencies.sum()),
+        "num_samples": int(len(latencies)),
+    }
+
+
+def time_calls(fn, inputs, warmup):
+    for x in inputs[:warmup]:
+        fn(x)
+
+    latencies = []
+    for x in inputs:
+        start = time.perf_counter()
+        fn(x)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def tiled_predictor(model, candidate, imgsz):
+    """ naive / roi 타일 추론 -> (프레임 추론 함수, 프레임의 CameraROI를 돌려주는 함수) """
+    sys.path.insert(0, str(Path(__file__).resolve().parent / "app"))
+    from services.roi import CameraROI, detect_tiled, get_camera_roi
+
+    if candidate["tiling"] == "roi":
+        roi = get_camera_roi(candidate.get("camera_id"))
+        if roi is None:
+            raise ValueError(f"ROI 설정이 없는 카메라입니다: {candidate.get('camera_id')}")
+        roi_for = lambda frame: roi
+    elif candidate["tiling"] == "naive":
+        # 프레임 전체를 덮는 ROI = 마스킹 없이 모든 타일 추론
+        full_rois = {}
+
+        def roi_for(frame):
+            h, w = frame.shape[:2]
+            if (h, w) not in full_rois:
+                full_rois[h, w] = CameraROI([[(0, 0), (w, 0), (w, h), (0, h)]], tile_size=imgsz, margin=0)
+            return full_rois[h, w]
+    else:
+        raise ValueError(f"알 수 없는 tiling: {candidate['tiling']}")
+
+    return (lambda frame: detect_tiled(model, frame, roi_for(frame))), roi_for
+
+
+def evaluate_detector(candidate, args):
+    """ YOLO 탐지 모델: mAP (ultralytics val) + 프레임당 지연시간 (tiling 방식별) """
+    from ultralytics import YOLO
+
+    path = candidate["path"]
+    imgsz = candidate.get("imgsz", 640)
+    tiling = candidate.get("tiling", "full")
+    task = "detect" if Path(path).suffix != ".pt" else None
+    model = YOLO(path, task=task)
+
+    result = {"tiling": tiling}
+    if args.data and tiling == "full":
+        metrics = model.val(data=args.data, imgsz=imgsz, device="cpu", batch=1, plots=False, verbose=False)
+        result["map50"] = float(metrics.box.map50)
+        result["map50_95"] = float(metrics.box.map)
+        result["score"] = result["map50_95"]
+
+    frames = [cv2.imread(str(p)) for p in list_images(args.images, args.max_images)]
+    if tiling == "full":
+        predict = lambda f: model.predict(f, imgsz=imgsz, device="cpu", verbose=False)
+    else:
+        predict, roi_for = tiled_predictor(model, candidate, imgsz)
+        result["tiles_per_frame"] = float(np.mean([len(roi_for(f).prepare(f.shape)[1]) for f in frames]))
+    latencies = time_calls(predict, frames, args.warmup)
+    result.update(latency_stats(latencies))
+    return result
+
+
+def load_torch_classifier(path, num_classes=2):
+    """ 노트북에서 저장한 ResNet50 (모델 전체 또는 state_dict) 로드 """
+    import torch
+    from torch import nn
+    from torchvision import models
+
+    checkpoint = torch.load(path, map_location="cpu", weights_only=False)
+    if isinstance(checkpoint, nn.Module):
+        model = checkpoint
+    else:
+        model = models.resnet50()
+        model.fc = nn.Linear(model.fc.in_features, num_classes)
+        model.load_state_dict(checkpoint)
+    return model.eval()
+
+
+def load_classifier(path):
+    """ 주차칸 분류 모델 로드 -> (N, 3, 64, 64) float32 배열을 받아 logits를 돌려주는 함수 """
+    if Path(path).suffix == ".onnx":
+        import onnxruntime as ort
+
+        session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+        input_name = session.get_inputs()[0].name
+        return lambda batch: session.run(None, {input_name: batch})[0]
+
+    import torch
+
+    model = load_torch_classifier(path)
+
+    def predict(batch):
+        with torch.no_grad():
+            return model(torch.from_numpy(batch)).numpy()
+
+    return predict
+
+
+def load_clf_samples(folder, limit=None):
+    """ 클래스별 하위 폴더 -> (이미지 배열 리스트, 라벨 배열). 노트북 MakeDataset과 같은 클래스 순서 """
+    def natural_key(string_):
+        try:
+            return int(string_)
+        except ValueError:
+            return string_
+
+    classes = sorted((c for c in os.listdir(folder) if os.path.isdir(os.path.join(folder, c))), key=natural_key)
+    samples, labels = [], []
+    for label, cls in enumerate(classes):
+        for path in list_images(os.path.join(folder, cls), limit):
+            image = cv2.imread(str(path))
+            if image is None:
+                continue
+            image = cv2.resize(cv2.cvtColor(image, cv2.COLOR_BGR2RGB), CLF_IMAGE_SHAPE)
+            samples.append((image.transpose(2, 0, 1)[None] / 255.0).astype(np.float32))
+            labels.append(label)
+    return samples, np.asarray(labels)
+
+
+def evaluate_classifier(candidate, args):
+    """ 주차칸 분류 모델: 정확도 + crop당 지연시간 """
+    predict = load_classifier(candidate["path"])
+    samples, labels = load_clf_samples(args.clf_data, args.max_images)
+
+    predictions = np.concatenate([predict(x).argmax(axis=1) for x in samples])
+    result = {"accuracy": float((predictions == labels).mean())}
+    result["score"] = result["accuracy"]
+
+    latencies = time_calls(predict, samples, args.warmup)
+    result.update(latency_stats(latencies))
+    return result
+
+
+EVALUATORS = {
+    "detector": evaluate_detector,
+    "classifier": evaluate_classifier,
+}
+
+
+def run_candidate(candidate, args):
+    """ 후보 하나 평가 + 메모리 측정 (run_isolated로 새 프로세스에서 실행) """
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    with PeakMemorySampler() as sampler:
+        result = EVALUATORS[candidate["type"]](candidate, args)
+    result["peak_memory_bytes"] = sampler.peak
+    result["baseline_memory_bytes"] = sampler.baseline
+    return result
+
+
+def run_isolated(candidate, args):
+    """
+    후보마다 새 프로세스에서 평가
+    -> 앞 후보가 남긴 메모리, 먼저 import된 torch/onnxruntime가 다음 후보의 peak에 섞이지 않음 (평가 순서와 무관)
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as executor:
+        return executor.submit(run_candidate, candidate, args).result()
+
+
+def pareto_front(rows):
+    """
+    score는 높을수록, p50 지연시간은 낮을수록 좋음. 다른 후보에 완전히 밀리지 않는 후보 표시
+    score가 없는 후보 (--data 없이 평가한 탐지 모델 등)는 비교에서 제외
+    """
+    scored = [row for row in rows if row.get("score") is not None]
+    for row in rows:
+        row["pareto"] = row.get("score") is not None and not any(
+            other is not row
+            and other["score"] >= row["score"]
+            and other["latency_p50_ms"] <= row["latency_p50_ms"]
+            and (other["score"] > row["score"] or other["latency_p50_ms"] < row["latency_p50_ms"])
+            for other in scored
+        )
+    return rows
+
+
+def format_table(rows):
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else "-"
+
+    lines = [
+        "| type | name | score | p50 (ms) | p95 (ms) | fps | tiles | peak mem (MB) | pareto |",
+        "|------|------|-------|----------|----------|-----|-------|---------------|--------|",
+    ]
+    for row in sorted(rows, key=lambda r: (r["type"], r["latency_p50_ms"])):
+        peak = row["peak_memory_bytes"] / 2**20 if row.get("peak_memory_bytes") else None
+        lines.append(
+            f"| {row['type']} | {row['name']} | {fmt(row.get('score'), '.4f')} "
+            f"| {row['latency_p50_ms']:.1f} | {row['latency_p95_ms']:.1f} | {row['throughput_fps']:.1f} "
+            f"| {fmt(row.get('tiles_per_frame'), '.1f')} | {fmt(peak, '.0f')} | {'✅' if row['pareto'] else ''} |"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="탐지/분류 모델 후보 정확도 vs 지연시간 평가 (CPU)")
+    parser.add_argument("--candidates", required=True, help="후보 모델 목록 json")
+    parser.add_argument("--data", help="탐지 모델 mAP 계산용 ultralytics data yaml (held-out split)")
+    parser.add_argument("--images", help="탐지 모델 지연시간 측정용 held-out 이미지 폴더")
+    parser.add_argument("--clf-data", help="분류 모델 평가용 held-out 폴더 (클래스별 하위 폴더)")
+    parser.add_argument("--max-images", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=None, help="torch CPU 스레드 수 (후보 프로세스마다 적용)")
+    parser.add_argument("--min-map", type=float, default=None, help="탐지 모델 정확도 기준 (mAP50-95)")
+    parser.add_argument("--min-accuracy", type=float, default=None, help="분류 모델 정확도 기준 (accuracy)")
+    parser.add_argument("--output", default="results/benchmark.json")
+    args = parser.parse_args()
+
+    with open(args.candidates, encoding="utf-8") as f:
+        candidates = json.load(f)
+
+    rows = []
+    for candidate in candidates:
+        print(f"⏱️ 평가 중: {candidate['name']}")
+        try:
+            result = run_isolated(candidate, args)
+        except Exception as e:
+            print(f"❌ 평가 실패: {candidate['name']}: {e}")
+            continue
+        rows.append({**candidate, **result})
+
+    for kind in EVALUATORS:
+        pareto_front([row for row in rows if row["type"] == kind])
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", encoding="utf-8") as f:
+        json.dump(rows, f, ensure_ascii=False, indent=2)
+
+    print(format_table(rows))
+    print(f"✅ 결과 저장: {output_path}")
+
+    # 같은 모델의 tiling 방식별 비용 비교 (roi 타일이 full / naive보다 싼지)
+    tilings = {}
+    for row in rows:
+        if row["type"] == "detector":
+            tilings.setdefault(row["path"], {})[row["tiling"]] = row["latency_p50_ms"]
+    for path, modes in tilings.items():
+        if len(modes) > 1:
+            print(f"⏱️ {Path(path).name} tiling p50: " + ", ".join(f"{m} {ms:.1f} ms" for m, ms in sorted(modes.items())))
+
+    # 탐지(mAP)와 분류(accuracy)는 척도가 다르므로 기준도 따로
+    thresholds = {"detector": args.min_map, "classifier": args.min_accuracy}
+    for kind, threshold in thresholds.items():
+        if threshold is None:
+            continue
+        passing = [r for r in rows if r["type"] == kind and r.get("score") is not None and r["score"] >= threshold]
+        if passing:
+            best = min(passing, key=lambda r: r["latency_p50_ms"])
+            print(f"✅ {kind}: 기준을 만족하는 가장 빠른 후보 = {best['name']} ({best['latency_p50_ms']:.1f} ms)")
+        else:
+            print(f"❌ {kind}: 기준 {threshold}를 만족하는 후보 없음")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+CPU 서빙용 모델 export: ONNX (FP32) + 정적 INT8 양자화 (우리 주차장 프레임으로 calibration)
+원본(.pt) 대비 FP32 ONNX, FP32 대비 INT8의 정확도 하락이 기준 이내인 모델만 publish 폴더에 복사
+
+사용 예:
+    python export_models.py --detector app/models/best_3000_xl.pt --calib-videos lot_videos \
+        --classifier app/models/slot_resnet50.pt --clf-data clf-data --clf-val-data clf-data-holdout \
+        --publish-dir app/models
+
+서빙: PARKING_MODEL_PATH=app/models/best_3000_xl_int8.onnx
+    (batch 1 고정 그래프로 export -> ROI 타일 추론 시 타일을 하나씩 넣음, roi.tile_batch_size 참고)
+"""
+import argparse
+import json
+import random
+import shutil
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from benchmark_models import CLF_IMAGE_SHAPE, list_images, load_classifier, load_clf_samples, load_torch_classifier
+
+VIDEO_EXTS = {".mp4", ".avi", ".mov", ".mkv"}
+
+
+def letterbox(frame, imgsz):
+    """ ultralytics LetterBox와 같은 전처리: 비율 유지 resize + 114 padding, BGR -> RGB, (1, 3, H, W) float32 """
+    h, w = frame.shape[:2]
+    scale = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - new_h) // 2, (imgsz - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = resized
+
+    rgb = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB)
+    return (rgb.transpose(2, 0, 1)[None] / 255.0).astype(np.float32)
+
+
+def sample_lot_frames(source, num_frames, seed=0):
+    """ 주차장 영상 폴더(또는 이미지 폴더)에서 calibration/검증용 프레임을 고르게 샘플링 """
+    source = Path(source)
+    videos = sorted(p for p in source.rglob("*") if p.suffix.lower() in VIDEO_EXTS)
+    frames = []
+
+    if not videos:
+        paths = list_images(source)
+        random.Random(seed).shuffle(paths)
+        return [cv2.imread(str(p)) for p in paths[:num_frames]]
+
+    per_video = max(1, num_frames // len(videos))
+    for video in videos:
+        cap = cv2.VideoCapture(str(video))
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        for pos in np.linspace(0, max(total - 1, 0), per_video, dtype=int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(pos))
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+        cap.release()
+
+    random.Random(seed).shuffle(frames)
+    return frames[:num_frames]
+
+
+class ArrayCalibrationReader:
+    """ onnxruntime CalibrationDataReader: 미리 전처리한 배열을 하나씩 넘겨줌 """
+
+    def __init__(self, input_name, batches):
+        self.input_name = input_name
+        self.batches = iter(batches)
+
+    def get_next(self):
+        batch = next(self.batches, None)
+        return None if batch is None else {self.input_name: batch}
+
+    def rewind(self):
+        pass
+
+
+def quantize_int8(fp32_path, int8_path, calib_batches):
+    """ 정적 INT8 양자화 (QDQ, per-channel weight) """
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    prepared_path = Path(fp32_path).with_name(Path(fp32_path).stem + "_prep.onnx")
+    quant_pre_process(str(fp32_path), str(prepared_path))
+
+    input_name = ort.InferenceSession(str(prepared_path), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    quantize_static(
+        str(prepared_path),
+        str(int8_path),
+        ArrayCalibrationReader(input_name, calib_batches),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=CalibrationMethod.MinMax,
+    )
+    prepared_path.unlink(missing_ok=True)
+    print(f"✅ INT8 양자화 완료: {int8_path}")
+    return Path(int8_path)
+
+
+def box_iou(a, b):
+    """ (N, 4), (M, 4) xyxy -> (N, M) IoU """
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def detection_agreement(reference, candidate, iou_threshold=0.5):
+    """ 원본(.pt) 결과를 정답으로 보고 export 모델 결과의 F1 (같은 클래스 + IoU 기준 greedy 매칭) """
+    matched = total_ref = total_cand = 0
+    for ref, cand in zip(reference, candidate):
+        total_ref += len(ref["boxes"])
+        total_cand += len(cand["boxes"])
+        if not len(ref["boxes"]) or not len(cand["boxes"]):
+            continue
+
+        iou = box_iou(ref["boxes"], cand["boxes"])
+        iou[ref["classes"][:, None] != cand["classes"][None, :]] = 0
+        while True:
+            i, j = np.unravel_index(np.argmax(iou), iou.shape)
+            if iou[i, j] < iou_threshold:
+                break
+            matched += 1
+            iou[i, :] = 0
+            iou[:, j] = 0
+
+    if total_ref == 0 and total_cand == 0:
+        return 1.0
+    return 2 * matched / (total_ref + total_cand)
+
+
+def predict_boxes(model, frames, imgsz):
+    outputs = []
+    for frame in frames:
+        result = model.predict(frame, imgsz=imgsz, device="cpu", verbose=False)[0]
+        outputs.append({
+            "boxes": result.boxes.xyxy.cpu().numpy(),
+            "classes": result.boxes.cls.cpu().numpy().astype(int),
+        })
+    return outputs
+
+
+def export_detector(args, out_dir):
+    """ YOLO 탐지 모델 -> ONNX FP32 / INT8, FP32 대비 검증 """
+    from ultralytics import YOLO
+
+    fp32_model = YOLO(args.detector)
+    fp32_path = Path(fp32_model.export(format="onnx", imgsz=args.imgsz, opset=args.opset, simplify=True, dynamic=False))
+    fp32_path = Path(shutil.move(str(fp32_path), out_dir / fp32_path.name))
+    print(f"✅ ONNX export 완료: {fp32_path}")
+
+    frames = sample_lot_frames(args.calib_videos, args.calib_frames + args.val_frames)
+    calib_frames, val_frames = frames[:args.calib_frames], frames[args.calib_frames:]
+
+    int8_path = out_dir / f"{fp32_path.stem}_int8.onnx"
+    quantize_int8(fp32_path, int8_path, (letterbox(f, args.imgsz) for f in calib_frames))
+
+    onnx_model = YOLO(str(fp32_path), task="detect")
+    int8_model = YOLO(str(int8_path), task="detect")
+    report = {"fp32": str(fp32_path), "int8": str(int8_path), "imgsz": args.imgsz}
+
+    if args.data:
+        # 라벨이 있는 held-out split이 있으면 mAP로 비교
+        def val_map(model):
+            return float(model.val(data=args.data, imgsz=args.imgsz, device="cpu", plots=False, verbose=False).box.map)
+
+        report.update({"metric": "map50_95", "pt_score": val_map(fp32_model),
+                       "fp32_score": val_map(onnx_model), "int8_score": val_map(int8_model)})
+    else:
+        # 라벨이 없으면 원본 .pt 결과 대비 일치율(F1)로 비교 (FP32 ONNX도 같은 방식으로 검증)
+        reference = predict_boxes(fp32_model, val_frames, args.imgsz)
+        report.update({
+            "metric": "agreement_f1_vs_pt",
+            "pt_score": 1.0,
+            "fp32_score": detection_agreement(reference, predict_boxes(onnx_model, val_frames, args.imgsz)),
+            "int8_score": detection_agreement(reference, predict_boxes(int8_model, val_frames, args.imgsz)),
+        })
+    return report
+
+
+def export_classifier(args, out_dir):
+    """ ResNet 주차칸 분류 모델 -> ONNX FP32 / INT8, held-out 정확도 비교 (calibration은 --clf-data, 검증은 --clf-val-data) """
+    import torch
+
+    model = load_torch_classifier(args.classifier)
+
+    fp32_path = out_dir / f"{Path(args.classifier).stem}.onnx"
+    dummy = torch.zeros(1, 3, *CLF_IMAGE_SHAPE)
+    torch.onnx.export(model, dummy, str(fp32_path), opset_version=args.opset,
+                      input_names=["images"], output_names=["logits"],
+                      dynamic_axes={"images": {0: "batch"}, "logits": {0: "batch"}})
+    print(f"✅ ONNX export 완료: {fp32_path}")
+
+    calib_samples, _ = load_clf_samples(args.clf_data)
+    calib_idx = np.random.default_rng(0).permutation(len(calib_samples))[:args.calib_frames]
+
+    int8_path = out_dir / f"{fp32_path.stem}_int8.onnx"
+    quantize_int8(fp32_path, int8_path, (calib_samples[i] for i in calib_idx))
+
+    val_samples, val_labels = load_clf_samples(args.clf_val_data)
+    val_idx = np.random.default_rng(0).permutation(len(val_samples))[:args.clf_val_samples]
+
+    def accuracy(predict):
+        predictions = np.array([predict(val_samples[i]).argmax(axis=1)[0] for i in val_idx])
+        return float((predictions == val_labels[val_idx]).mean())
+
+    return {
+        "fp32": str(fp32_path),
+        "int8": str(int8_path),
+        "metric": "accuracy",
+        "pt_score": accuracy(load_classifier(args.classifier)),
+        "fp32_score": accuracy(load_classifier(str(fp32_path))),
+        "int8_score": accuracy(load_classifier(str(int8_path))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX + INT8 export (CPU 서빙용)")
+    parser.add_argument("--detector", help="YOLO .pt 가중치")
+    parser.add_argument("--classifier", help="ResNet 주차칸 분류 모델 .pt")
+    parser.add_argument("--calib-videos", help="탐지 모델 calibration용 주차장 영상/이미지 폴더")
+    parser.add_argument("--clf-data", help="분류 모델 calibration용 폴더 (클래스별 하위 폴더, 학습 데이터여도 됨)")
+    parser.add_argument("--clf-val-data", help="분류 모델 검증용 held-out 폴더 (--clf-data와 겹치지 않아야 함)")
+    parser.add_argument("--data", help="탐지 모델 mAP 비교용 ultralytics data yaml (선택)")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--calib-frames", type=int, default=200)
+    parser.add_argument("--val-frames", type=int, default=50, help="탐지 모델 일치율 검증 프레임 수 (--data 없을 때)")
+    parser.add_argument("--clf-val-samples", type=int, default=500, help="분류 모델 정확도 검증 crop 수")
+    parser.add_argument("--max-drop", type=float, default=0.01, help="허용 정확도 하락 (.pt -> FP32, FP32 -> INT8 각각)")
+    parser.add_argument("--work-dir", default="export")
+    parser.add_argument("--publish-dir", default="app/models")
+    args = parser.parse_args()
+
+    if args.classifier:
+        if not args.clf_data or not args.clf_val_data:
+            parser.error("--classifier에는 --clf-data(calibration)와 --clf-val-data(held-out 검증)가 필요합니다")
+        if Path(args.clf_data).resolve() == Path(args.clf_val_data).resolve():
+            parser.error("--clf-val-data는 calibration 폴더(--clf-data)와 다른 held-out 폴더여야 합니다")
+
+    out_dir = Path(args.work_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    publish_dir = Path(args.publish_dir)
+    publish_dir.mkdir(parents=True, exist_ok=True)
+
+    reports = {}
+    if args.detector:
+        reports["detector"] = export_detector(args, out_dir)
+    if args.classifier:
+        reports["classifier"] = export_classifier(args, out_dir)
+
+    for name, report in reports.items():
+        fp32_drop = report["pt_score"] - report["fp32_score"]
+        int8_drop = report["fp32_score"] - report["int8_score"]
+        report["fp32_passed"] = fp32_drop <= args.max_drop
+        report["passed"] = report["fp32_passed"] and int8_drop <= args.max_drop
+        print(f"{'✅' if report['passed'] else '❌'} {name}: {report['metric']} "
+              f".pt {report['pt_score']:.4f} / FP32 {report['fp32_score']:.4f} (하락 {fp32_drop:.4f}) "
+              f"/ INT8 {report['int8_score']:.4f} (하락 {int8_drop:.4f})")
+
+        # 각 단계에서 기준을 통과한 모델만 publish (FP32가 실패하면 INT8도 publish하지 않음)
+        published = ([report["fp32"]] if report["fp32_passed"] else []) + ([report["int8"]] if report["passed"] else [])
+        report["published"] = [str(shutil.copy2(path, publish_dir / Path(path).name)) for path in published]
+
+    manifest_path = publish_dir / "export_manifest.json"
+    with manifest_path.open("w", encoding="utf-8") as f:
+        json.dump(reports, f, ensure_ascii=False, indent=2)
+    print(f"✅ manifest 저장: {manifest_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""
+FastAPI 앱 부하 테스트 (프로세스 안에서 실행, 실제 YOLO/DeepSORT 대신 stub 사용 -> 오프라인 실행 가능)
+
+- app (JKL/app): 동시 클라이언트가 upload -> preview -> select -> assign_batch -> annotations -> download 반복
+                 동시에 /healthz를 주기적으로 호출해서 이벤트 루프가 막히는지 확인
+- testapp (JKL/testapp/main.py, main1.py): 동시 업로드 + WebSocket 구독자가 프레임 수신
+
+주의: StubDetector는 상태가 없어서 여러 스레드가 동시에 호출해도 결과가 섞이지 않음
+      -> 실제 ultralytics predictor의 thread-safety 문제(작업 간 결과 섞임)는 이 테스트로 잡을 수 없음
+
+사용 예:
+    python loadtest.py --clients 16 --iterations 5 --output results/loadtest.json
+    python loadtest.py --target testapp/main1.py --clients 4 --subscribers 8
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import types
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+JKL_DIR = Path(__file__).resolve().parent
+TEST_VIDEO_FPS = 30
+
+
+class _StubTensor:
+    """ ultralytics 결과의 tensor처럼 .cpu().numpy() / 행 단위 iteration 지원 """
+
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+    def __getitem__(self, idx):
+        return _StubTensor(self.array[idx])
+
+    def __iter__(self):
+        return (_StubTensor(row) for row in self.array)
+
+    def __len__(self):
+        return len(self.array)
+
+
+class _StubBoxes:
+    def __init__(self, data):
+        self.data = _StubTensor(data)
+        self.xyxy = _StubTensor(data[:, :4])
+        self.conf = _StubTensor(data[:, 4])
+        self.cls = _StubTensor(data[:, 5])
+
+    def __iter__(self):
+        for row in self.data.array:
+            yield _StubBoxes(row[None])
+
+    def __len__(self):
+        return len(self.data.array)
+
+
+class _StubResult:
+    def __init__(self, data, speed):
+        self.boxes = _StubBoxes(data)
+        self.speed = speed
+
+
+class StubDetector:
+    """
+    프레임 크기에 맞춘 고정 주차칸 격자를 돌려주는 가짜 YOLO (latency_ms 만큼 sleep)
+    - 입력 프레임만 보고 결과를 만들므로 동시 호출에도 안전 (실제 predictor와 다름, 동시성 버그 검증용 아님)
+    """
+
+    names = {0: "free", 1: "occupied"}
+
+    def __init__(self, latency_ms=20.0, rows=2, cols=8):
+        self.latency_ms = latency_ms
+        self.rows = rows
+        self.cols = cols
+        self.calls = 0
+
+    def _predict(self, frame):
+        h, w = frame.shape[:2]
+        cell_w, cell_h = w / self.cols, h / (self.rows * 2)
+        boxes = []
+        for r in range(self.rows):
+            for c in range(self.cols):
+                x1, y1 = c * cell_w + 4, (2 * r + 0.5) * cell_h
+                # 호출마다 일부 칸의 상태가 바뀌도록
+                cls = (r * self.cols + c + self.calls // 30) % 3 == 0
+                boxes.append([x1, y1, x1 + cell_w - 8, y1 + cell_h, 0.9, float(cls)])
+        return np.array(boxes, dtype=np.float32)
+
+    def __call__(self, source, verbose=True, **kwargs):
+        frames = source if isinstance(source, list) else [source]
+        time.sleep(self.latency_ms * len(frames) / 1000)
+        self.calls += 1
+        speed = {"preprocess": 1.0, "inference": self.latency_ms, "postprocess": 0.5}
+        return [_StubResult(self._predict(frame), speed) for frame in frames]
+
+
+class StubDeepSort:
+    """ deep_sort_realtime.DeepSort 대신 사용 (추적 없음) """
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def update_tracks(self, raw_detections, frame=None, others=None, **kwargs):
+        return []
+
+
+def install_stub_modules(detector, real_tracker=False):
+    """ ultralytics / deep_sort_realtime import를 stub으로 대체 (가중치 다운로드, GPU 없이 실행) """
+    ultralytics = types.ModuleType("ultralytics")
+    ultralytics.YOLO = lambda *args, **kwargs: detector
+    sys.modules["ultralytics"] = ultralytics
+
+    if not real_tracker:
+        package = types.ModuleType("deep_sort_realtime")
+        tracker_module = types.ModuleType("deep_sort_realtime.deepsort_tracker")
+        tracker_module.DeepSort = StubDeepSort
+        package.deepsort_tracker = tracker_module
+        sys.modules["deep_sort_realtime"] = package
+        sys.modules["deep_sort_realtime.deepsort_tracker"] = tracker_module
+
+
+def make_test_video(path, frames, width, height, fps=TEST_VIDEO_FPS):
+    """ 움직이는 사각형이 있는 합성 영상 """
+    out = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for i in range(frames):
+        frame = np.full((height, width, 3), 60, dtype=np.uint8)
+        x = (i * 15) % max(1, width - 120)
+        cv2.rectangle(frame, (x, height // 2), (x + 120, height // 2 + 60), (0, 200, 255), -1)
+        out.write(frame)
+    out.release()
+    return Path(path).read_bytes()
+
+
+class Recorder:
+    """ endpoint별 (지연시간, 성공 여부) 기록 """
+
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, seconds, ok, error=None):
+        with self._lock:
+            self.records.append({"endpoint": endpoint, "seconds": seconds, "ok": ok, "error": error})
+
+    def call(self, endpoint, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = fn(*args, **kwargs)
+            ok = response.status_code < 400
+            error = None if ok else f"HTTP {response.status_code}"
+        except Exception as e:
+            response, ok, error = None, False, repr(e)
+        self.add(endpoint, time.perf_counter() - start, ok, error)
+        return response if ok else None
+
+    def summary(self, wall_seconds):
+        endpoints = {}
+        for record in self.records:
+            endpoints.setdefault(record["endpoint"], []).append(record)
+
+        summary = {}
+        for endpoint, records in sorted(endpoints.items()):
+            latencies = np.array([r["seconds"] for r in records]) * 1000
+            errors = [r["error"] for r in records if not r["ok"]]
+            summary[endpoint] = {
+                "count": len(records),
+                "errors": len(errors),
+                "error_rate": len(errors) / len(records),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p95_ms": float(np.percentile(latencies, 95)),
+                "p99_ms": float(np.percentile(latencies, 99)),
+                "max_ms": float(latencies.max()),
+                "throughput_rps": len(records) / wall_seconds,
+                "sample_errors": sorted(set(errors))[:3],
+            }
+        return summary
+
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_prober(client, recorder, stop, interval):
+    """ 이벤트 루프가 막히면 /healthz 지연시간이 튐 """
+    while not stop.is_set():
+        recorder.call("GET /healthz", client.get, "/healthz")
+        time.sleep(interval)
+
+
+def app_client_flow(client, recorder, video_bytes, args, seed):
+    rng = random.Random(seed)
+    for _ in range(args.iterations):
+        response = recorder.call("POST /video/upload/", client.post, "/video/upload/",
+                                 files={"file": ("lot.mp4", video_bytes, "video/mp4")})
+        if response is None:
+            continue
+        upload = response.json()
+        video_id = upload["video_id"]
+
+        recorder.call("GET /video/preview/{video_id}", client.get, upload["preview_url"])
+
+        response = recorder.call("POST /video/select_parking_spot/", client.post, "/video/select_parking_spot/",
+                                 json={"video_id": video_id, "x": rng.randrange(args.width),
+                                       "y": rng.randrange(args.height)})
+        if response is None:
+            continue
+        selected = response.json()
+
+        requesters = [{"x": rng.randrange(args.width), "y": rng.randrange(args.height)} for _ in range(args.batch)]
+        recorder.call("POST /video/assign_parking_batch/", client.post, "/video/assign_parking_batch/",
+                      json={"video_id": video_id, "requesters": requesters})
+        recorder.call("GET /video/annotations/{video_id}", client.get, selected["annotations_url"])
+        if args.render:
+            recorder.call("GET /video/download/{video_id}", client.get, selected["download_url"],
+                          params={"width": args.render_width})
+
+
+def run_app(args, workdir, detector):
+    """ JKL/app 부하 테스트 """
+    sys.path.insert(0, str(JKL_DIR / "app"))
+    app_main = load_module("parking_app_main", JKL_DIR / "app" / "main.py")
+    video_service = sys.modules["services.video_service"]
+    video_service.yolo_model = detector  # warm_up / get_model이 stub을 사용
+
+    from fastapi.testclient import TestClient
+
+    video_bytes = make_test_video(workdir / "lot.mp4", args.frames, args.width, args.height)
+    recorder = Recorder()
+
+    with TestClient(app_main.app) as client:
+        stop = threading.Event()
+        prober = threading.Thread(target=run_prober, args=(client, recorder, stop, args.probe_interval), daemon=True)
+        prober.start()
+
+        start = time.perf_counter()
+        workers = [threading.Thread(target=app_client_flow, args=(client, recorder, video_bytes, args, i))
+                   for i in range(args.clients)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        wall = time.perf_counter() - start
+
+        stop.set()
+        prober.join()
+        metrics = client.get("/metrics").text
+
+    return recorder.summary(wall), wall, metrics
+
+
+def run_subscriber(client, recorder, expected, ready, timeout):
+    """ WebSocket으로 프레임을 받으면서 프레임 간격 기록 """
+    try:
+        with client.websocket_connect("/ws") as websocket:
+            ready.release()
+            last = time.perf_counter()
+            deadline = last + timeout
+            for _ in range(expected):
+                if time.perf_counter() > deadline:
+                    recorder.add("WS /ws frame", timeout, False, "timeout")
+                    break
+                websocket.receive_text()
+                now = time.perf_counter()
+                recorder.add("WS /ws frame", now - last, True)
+                last = now
+    except Exception as e:
+        ready.release()
+        recorder.add("WS /ws frame", 0.0, False, repr(e))
+
+
+def run_testapp(args, workdir, detector):
+    """ JKL/testapp 부하 테스트 (업로드 + WebSocket 구독) """
+    (workdir / "static").mkdir(exist_ok=True)
+    testapp = load_module("parking_testapp", JKL_DIR / args.target)
+
+    from fastapi.testclient import TestClient
+
+    video_bytes = make_test_video(workdir / "lot.mp4", args.frames, args.width, args.height)
+    recorder = Recorder()
+    has_assign = any(getattr(route, "path", None) == "/assign_parking/" for route in testapp.app.routes)
+    expected = args.clients * args.iterations * args.frames
+
+    def uploader(i):
+        rng = random.Random(i)
+        for n in range(args.iterations):
+            recorder.call("POST /upload/", client.post, "/upload/",
+                          files={"file": (f"lot_{i}_{n}.mp4", video_bytes, "video/mp4")})
+            if has_assign:
+                recorder.call("POST /assign_parking/", client.post, "/assign_parking/",
+                              json={"x": rng.randrange(args.width), "y": rng.randrange(args.height)})
+
+    with TestClient(testapp.app) as client:
+        # 구독자가 먼저 연결된 뒤 업로드 시작
+        ready = threading.Semaphore(0)
+        subscribers = [threading.Thread(target=run_subscriber,
+                                        args=(client, recorder, expected, ready, args.timeout), daemon=True)
+                       for _ in range(args.subscribers)]
+        for subscriber in subscribers:
+            subscriber.start()
+        for _ in subscribers:
+            ready.acquire()
+
+        start = time.perf_counter()
+        uploaders = [threading.Thread(target=uploader, args=(i,)) for i in range(args.clients)]
+        for thread in uploaders:
+            thread.start()
+        for thread in uploaders:
+            thread.join()
+        for subscriber in subscribers:
+            subscriber.join(args.timeout)
+        wall = time.perf_counter() - start
+
+    return recorder.summary(wall), wall, None
+
+
+def format_table(summary):
+    lines = [
+        "| endpoint | count | errors | p50 (ms) | p95 (ms) | p99 (ms) | max (ms) | rps |",
+        "|----------|-------|--------|----------|----------|----------|----------|-----|",
+    ]
+    for endpoint, s in summary.items():
+        lines.append(f"| {endpoint} | {s['count']} | {s['errors']} | {s['p50_ms']:.1f} | {s['p95_ms']:.1f} "
+                     f"| {s['p99_ms']:.1f} | {s['max_ms']:.1f} | {s['throughput_rps']:.1f} |")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FastAPI 앱 in-process 부하 테스트 (stub 탐지 모델)")
+    parser.add_argument("--target", default="app", help="app 또는 testapp/main.py, testapp/main1.py")
+    parser.add_argument("--clients", type=int, default=8, help="동시 클라이언트 수")
+    parser.add_argument("--iterations", type=int, default=3, help="클라이언트당 반복 횟수")
+    parser.add_argument("--subscribers", type=int, default=4, help="WebSocket 구독자 수 (testapp)")
+    parser.add_argument("--frames", type=int, default=60, help="테스트 영상 프레임 수")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--detector-ms", type=float, default=20.0, help="stub 탐지 모델의 프레임당 지연시간")
+    parser.add_argument("--batch", type=int, default=20, help="assign_parking_batch 요청당 운전자 수")
+    parser.add_argument("--no-render", dest="render", action="store_false", help="영상 렌더링/다운로드 생략")
+    parser.add_argument("--render-width", type=int, default=640)
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--real-tracker", action="store_true", help="실제 DeepSORT 사용")
+    parser.add_argument("--output", help="결과 json 저장 경로")
+    args = parser.parse_args()
+
+    # app은 업로드마다 1초 위치(fps번째) 프레임으로 미리보기를 만들므로 그보다 짧은 영상은 모두 500
+    if args.target == "app" and args.frames <= TEST_VIDEO_FPS:
+        parser.error(f"--frames는 {TEST_VIDEO_FPS + 1} 이상이어야 합니다 (1초 미리보기 프레임 필요, {TEST_VIDEO_FPS}fps)")
+
+    detector = StubDetector(latency_ms=args.detector_ms)
+    install_stub_modules(detector, real_tracker=args.real_tracker)
+    output = Path(args.output).resolve() if args.output else None
+
+    # 앱이 만드는 업로드/결과 파일은 임시 폴더에 생성
+    workdir = Path(tempfile.mkdtemp(prefix="parking_loadtest_"))
+    os.chdir(workdir)
+    print(f"⏱️ 부하 테스트 시작: {args.target} (작업 폴더 {workdir})")
+
+    if args.target == "app":
+        summary, wall, metrics = run_app(args, workdir, detector)
+    else:
+        summary, wall, metrics = run_testapp(args, workdir, detector)
+
+    print(format_table(summary))
+    print(f"✅ 완료: {wall:.1f}초")
+
+    if output:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with output.open("w", encoding="utf-8") as f:
+            json.dump({"target": args.target, "args": vars(args), "wall_seconds": wall,
+                       "endpoints": summary, "metrics": metrics}, f, ensure_ascii=False, indent=2)
+        print(f"✅ 결과 저장: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
 import os
+import sys
 import cv2
+import time
+import uuid
 import asyncio
 import base64
 import numpy as np
+from pathlib import Path
 from fastapi import FastAPI, File, UploadFile, WebSocket
 from fastapi.staticfiles import StaticFiles
 from starlette.responses import FileResponse
@@ -10,10 +14,17 @@ from starlette.websockets import WebSocketDisconnect
 from ultralytics import YOLO  # YOLOv8 모델 사용
 from deep_sort_realtime.deepsort_tracker import DeepSort
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))  # JKL/app 모듈 사용
+from services.storage import StorageManager
+from services.metrics import (FRAMES_TOTAL, JOB_SECONDS, JOBS_IN_PROGRESS, JOBS_TOTAL, MODEL_LOAD_SECONDS,
+                              observe_yolo_speed, timed)
+from routers.metrics import metrics_router
+
 import os
 from fastapi.staticfiles import StaticFiles
 
 app = FastAPI()
+app.include_router(metrics_router)
 app.mount("/static", StaticFiles(directory='static'), name="static")
 
 from fastapi import HTTPException
@@ -57,13 +68,17 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 async def serve_index():
     return FileResponse("static/index2.html")
 
-# ✅ 저장할 디렉토리
+# ✅ 저장할 디렉토리 (용량/보관 기간은 환경변수로 조정)
 UPLOAD_DIR = "uploads"
-OUTPUT_VIDEO = "static/output.mp4"  # 결과 비디오 저장 경로
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+OUTPUT_DIR = "outputs"  # 결과 비디오 저장 경로
+upload_store = StorageManager.from_env(UPLOAD_DIR, "upload")
+output_store = StorageManager.from_env(OUTPUT_DIR, "download")
+latest_output = None  # 가장 최근에 처리가 끝난 결과 영상 이름
 
 # ✅ YOLOv8 + DeepSORT 초기화
+load_start = time.perf_counter()
 yolo_model = YOLO("static/best_3000_xl.pt")  # YOLOv8 모델
+MODEL_LOAD_SECONDS.set(time.perf_counter() - load_start, model="yolo")
 tracker = DeepSort(max_age=30)
 
 # ✅ 웹소켓 연결 관리
@@ -80,10 +95,12 @@ class ConnectionManager:
 
     async def send_frame(self, frame: np.ndarray):
         """프레임을 WebSocket을 통해 전송"""
-        _, buffer = cv2.imencode('.jpg', frame)
-        frame_data = base64.b64encode(buffer).decode('utf-8')
-        for connection in self.active_connections:
-            await connection.send_text(frame_data)
+        with timed("websocket_encode"):
+            _, buffer = cv2.imencode('.jpg', frame)
+            frame_data = base64.b64encode(buffer).decode('utf-8')
+        with timed("websocket_send"):
+            for connection in self.active_connections:
+                await connection.send_text(frame_data)
 
 manager = ConnectionManager()
 
@@ -91,32 +108,61 @@ manager = ConnectionManager()
 @app.post("/upload/")
 async def upload_video(file: UploadFile = File(...)):
     """사용자가 업로드한 MP4 파일 저장"""
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
+    # 같은 이름의 파일이 동시에 올라와도 겹치지 않도록 저장 이름은 새로 만듦
+    video_name = f"{uuid.uuid4()}{Path(file.filename or '').suffix or '.mp4'}"
+    with upload_store.atomic_write(video_name) as tmp_path:
+        with open(tmp_path, "wb") as buffer:
+            buffer.write(await file.read())
 
     # ✅ 업로드된 비디오를 처리하는 `process_video()` 실행
-    asyncio.create_task(process_video(file_path))
+    asyncio.create_task(process_upload(video_name))
     
-    return {"filename": file.filename, "path": file_path}
+    return {"filename": file.filename, "path": str(upload_store.path(video_name))}
+
+async def process_upload(video_name):
+    """처리하는 동안 원본 영상은 삭제되지 않도록 보호"""
+    JOBS_IN_PROGRESS.inc()
+    start = time.perf_counter()
+    try:
+        with upload_store.hold(video_name) as (file_path,):
+            await process_video(str(file_path), video_name)
+    except Exception:
+        JOBS_TOTAL.inc(status="failed")
+        raise
+    finally:
+        JOBS_IN_PROGRESS.dec()
+    JOB_SECONDS.observe(time.perf_counter() - start)
+    JOBS_TOTAL.inc(status="succeeded")
 
 # ✅ YOLO + DeepSORT 처리 & 실시간 프레임 스트리밍
-async def process_video(file_path):
+async def process_video(file_path, video_name):
     """YOLO + DeepSORT 적용 후 WebSocket으로 실시간 프레임 전송"""
+    global latest_output
+
     cap = cv2.VideoCapture(file_path)
     fourcc = cv2.VideoWriter_fourcc(*"mp4v")
     fps = int(cap.get(cv2.CAP_PROP_FPS))
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    out = cv2.VideoWriter(OUTPUT_VIDEO, fourcc, fps, (width, height))
+    output_name = f"output_{Path(video_name).stem}.mp4"
+    with output_store.atomic_write(output_name) as tmp_path:
+        out = cv2.VideoWriter(str(tmp_path), fourcc, fps, (width, height))
+        await write_tracked_video(cap, out)
 
+    latest_output = output_name
+    print("✅ 영상 처리 완료!")
+
+async def write_tracked_video(cap, out):
     while cap.isOpened():
-        ret, frame = cap.read()
+        with timed("decode"):
+            ret, frame = cap.read()
         if not ret:
             break
 
         # ✅ YOLO 객체 탐지 수행
         results = yolo_model(frame)
+        for result in results:
+            observe_yolo_speed(result)
         detections = []
         for r in results:
             for box in r.boxes.data:
@@ -124,26 +170,29 @@ async def process_video(file_path):
                 detections.append(([x1, y1, x2, y2], conf, int(cls)))
 
         # ✅ DeepSORT 트래커 적용
-        tracks = tracker.update_tracks(detections, frame=frame)
-        for track in tracks:
-            if track.is_confirmed():
-                x1, y1, x2, y2 = track.to_tlbr()
-                track_id = track.track_id
-                cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
-                cv2.putText(frame, f"ID {track_id}", (int(x1), int(y1) - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        with timed("tracking"):
+            tracks = tracker.update_tracks(detections, frame=frame)
+        with timed("drawing"):
+            for track in tracks:
+                if track.is_confirmed():
+                    x1, y1, x2, y2 = track.to_tlbr()
+                    track_id = track.track_id
+                    cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
+                    cv2.putText(frame, f"ID {track_id}", (int(x1), int(y1) - 10),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
 
         # ✅ 웹소켓으로 실시간 전송
         await manager.send_frame(frame)
 
         # ✅ 최종 영상 저장
-        out.write(frame)
+        with timed("encoding"):
+            out.write(frame)
+        FRAMES_TOTAL.inc()
 
         await asyncio.sleep(0.03)  # 30 FPS 유지
 
     cap.release()
     out.release()
-    print("✅ 영상 처리 완료!")
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -160,4 +209,13 @@ async def websocket_endpoint(websocket: WebSocket):
 @app.get("/download/")
 async def download_video():
     """최종 처리된 MP4 영상 다운로드"""
-    return {"download_url": f"http://localhost:8000/static/output.mp4"}
+    if latest_output is None or not output_store.exists(latest_output):
+        raise HTTPException(status_code=404, detail="처리된 영상이 없습니다.")
+    return {"download_url": f"http://localhost:8000/output/{latest_output}"}
+
+@app.get("/output/{filename}")
+async def output_video(filename: str):
+    """처리된 MP4 영상 파일"""
+    if not output_store.exists(filename):
+        raise HTTPException(status_code=404, detail="처리된 영상이 없습니다.")
+    return FileResponse(output_store.touch(filename), media_type="video/mp4", filename=filename)
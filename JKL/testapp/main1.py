@@ -1,8 +1,12 @@
 import os
+import sys
 import cv2
+import time
+import uuid
 import asyncio
 import base64
 import numpy as np
+from pathlib import Path
 from fastapi import FastAPI, File, UploadFile, WebSocket
 from fastapi.staticfiles import StaticFiles
 from starlette.responses import FileResponse
@@ -10,7 +14,14 @@ from starlette.websockets import WebSocketDisconnect
 from ultralytics import YOLO  # YOLOv8 모델 사용
 from deep_sort_realtime.deepsort_tracker import DeepSort
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))  # JKL/app 모듈 사용
+from services.storage import StorageManager
+from services.metrics import (FRAMES_TOTAL, JOB_SECONDS, JOBS_IN_PROGRESS, JOBS_TOTAL, MODEL_LOAD_SECONDS,
+                              observe_yolo_speed, timed)
+from routers.metrics import metrics_router
+
 app = FastAPI()
+app.include_router(metrics_router)
 
 # ✅ 정적 파일 제공 (HTML, CSS, JS)
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -20,13 +31,15 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 async def serve_index():
     return FileResponse("static/index2.html")
 
-# ✅ 저장할 디렉토리
+# ✅ 저장할 디렉토리 (용량/보관 기간은 환경변수로 조정)
 UPLOAD_DIR = "uploads"
 OUTPUT_VIDEO = "static/output.mp4"  # 결과 비디오 저장 경로
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+upload_store = StorageManager.from_env(UPLOAD_DIR, "upload")
 
 # ✅ YOLOv8 + DeepSORT 초기화
+load_start = time.perf_counter()
 yolo_model = YOLO("static/best_3000_xl.pt")  # YOLO 모델
+MODEL_LOAD_SECONDS.set(time.perf_counter() - load_start, model="yolo")
 tracker = DeepSort(max_age=30)
 
 # ✅ 웹소켓 연결 관리
@@ -43,10 +56,12 @@ class ConnectionManager:
 
     async def send_frame(self, frame: np.ndarray):
         """프레임을 WebSocket을 통해 전송"""
-        _, buffer = cv2.imencode('.jpg', frame)
-        frame_data = base64.b64encode(buffer).decode('utf-8')
-        for connection in self.active_connections:
-            await connection.send_text(frame_data)
+        with timed("websocket_encode"):
+            _, buffer = cv2.imencode('.jpg', frame)
+            frame_data = base64.b64encode(buffer).decode('utf-8')
+        with timed("websocket_send"):
+            for connection in self.active_connections:
+                await connection.send_text(frame_data)
 
 manager = ConnectionManager()
 
@@ -54,14 +69,31 @@ manager = ConnectionManager()
 @app.post("/upload/")
 async def upload_video(file: UploadFile = File(...)):
     """사용자가 업로드한 MP4 파일 저장"""
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
+    # 같은 이름의 파일이 동시에 올라와도 겹치지 않도록 저장 이름은 새로 만듦
+    video_name = f"{uuid.uuid4()}{Path(file.filename or '').suffix or '.mp4'}"
+    with upload_store.atomic_write(video_name) as tmp_path:
+        with open(tmp_path, "wb") as buffer:
+            buffer.write(await file.read())
 
     # ✅ 업로드된 비디오를 처리하는 `process_video()` 실행
-    asyncio.create_task(process_video(file_path))
+    asyncio.create_task(process_upload(video_name))
     
-    return {"filename": file.filename, "path": file_path}
+    return {"filename": file.filename, "path": str(upload_store.path(video_name))}
+
+async def process_upload(video_name):
+    """처리하는 동안 원본 영상은 삭제되지 않도록 보호"""
+    JOBS_IN_PROGRESS.inc()
+    start = time.perf_counter()
+    try:
+        with upload_store.hold(video_name) as (file_path,):
+            await process_video(str(file_path))
+    except Exception:
+        JOBS_TOTAL.inc(status="failed")
+        raise
+    finally:
+        JOBS_IN_PROGRESS.dec()
+    JOB_SECONDS.observe(time.perf_counter() - start)
+    JOBS_TOTAL.inc(status="succeeded")
 
 # ✅ YOLO + DeepSORT 처리 & 실시간 프레임 스트리밍
 async def process_video(file_path):
@@ -173,12 +205,15 @@ async def process_video(file_path):
         return
 
     while cap.isOpened():
-        ret, frame = cap.read()
+        with timed("decode"):
+            ret, frame = cap.read()
         if not ret:
             break
 
         # ✅ YOLO 객체 탐지 수행
         results = yolo_model(frame)
+        for result in results:
+            observe_yolo_speed(result)
         detections = []
         parking_spot_counter = 1  # 주차칸 번호 카운터
         updated_results = []  # YOLO 감지된 객체 저장 리스트
@@ -203,25 +238,28 @@ async def process_video(file_path):
         last_yolo_results[:] = updated_results  # 리스트 전체를 업데이트
 
         # ✅ DeepSORT 트래커 적용 (움직이는 차량만 추적)
-        tracks = tracker.update_tracks(detections, frame=frame)
-        for track in tracks:
-            if track.is_confirmed():
-                x1, y1, x2, y2 = track.to_tlbr()
-                track_id = track.track_id
-                cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (255, 255, 0), 2)  # 노란색 박스 (움직이는 차량)
-                cv2.putText(frame, f"Car {track_id}", (int(x1), int(y1) - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
-
-        # ✅ 사용자 선택한 특정 지점에 파란 점 유지
-        if user_selected_point:
-            cv2.circle(frame, (int(user_selected_point[0]), int(user_selected_point[1])), 10, (255, 0, 0), -1)  # 파란 점
-
-        # ✅ 배정된 주차 공간에 파란 점 유지
-        if assigned_parking_spot:
-            cv2.circle(frame, (int(assigned_parking_spot[0]), int(assigned_parking_spot[1])), 10, (255, 0, 0), -1)  # 파란 점
+        with timed("tracking"):
+            tracks = tracker.update_tracks(detections, frame=frame)
+        with timed("drawing"):
+            for track in tracks:
+                if track.is_confirmed():
+                    x1, y1, x2, y2 = track.to_tlbr()
+                    track_id = track.track_id
+                    cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (255, 255, 0), 2)  # 노란색 박스 (움직이는 차량)
+                    cv2.putText(frame, f"Car {track_id}", (int(x1), int(y1) - 10),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
+
+            # ✅ 사용자 선택한 특정 지점에 파란 점 유지
+            if user_selected_point:
+                cv2.circle(frame, (int(user_selected_point[0]), int(user_selected_point[1])), 10, (255, 0, 0), -1)  # 파란 점
+
+            # ✅ 배정된 주차 공간에 파란 점 유지
+            if assigned_parking_spot:
+                cv2.circle(frame, (int(assigned_parking_spot[0]), int(assigned_parking_spot[1])), 10, (255, 0, 0), -1)  # 파란 점
 
         # ✅ 웹소켓으로 실시간 전송
         await manager.send_frame(frame)
+        FRAMES_TOTAL.inc()
 
     cap.release()
     print("✅ 영상 처리 완료!")
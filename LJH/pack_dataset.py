@@ -0,0 +1,156 @@
+import os
+import json
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import Dataset
+
+# 패킹 결과 파일 이름
+IMAGES_FILE = 'images.npy'
+LABELS_FILE = 'labels.npy'
+INDEX_FILE = 'index.json'
+
+
+def natural_key(string_):
+    try:
+        return int(string_)
+    except ValueError:
+        return string_
+
+
+def pack_clf_data(root_folder, output_folder, image_shape=(64, 64)):
+    """
+    clf-data 폴더(클래스별 하위 폴더)를 한 번만 디코딩해서
+    연속된 uint8 배열 파일(N, H, W, 3) + 라벨 배열 + 인덱스(json)로 저장
+    """
+    classes = sorted(os.listdir(root_folder), key=natural_key)
+    classes = [c for c in classes if os.path.isdir(os.path.join(root_folder, c))]
+    class_to_idx = {cls: i for i, cls in enumerate(classes)}
+
+    items = []
+    for label in classes:
+        label_folder = os.path.join(root_folder, label)
+        for image_name in sorted(os.listdir(label_folder)):
+            items.append((os.path.join(label_folder, image_name), class_to_idx[label]))
+
+    os.makedirs(output_folder, exist_ok=True)
+    height, width = image_shape
+
+    # 미리 전체 크기로 할당한 뒤 한 장씩 채워 넣음 (메모리에 전체를 올리지 않음)
+    images = np.lib.format.open_memmap(os.path.join(output_folder, IMAGES_FILE), mode='w+',
+                                       dtype=np.uint8, shape=(len(items), height, width, 3))
+    labels = np.empty(len(items), dtype=np.int64)
+    paths = []
+    skipped = []
+
+    count = 0
+    for image_path, label in items:
+        try:
+            image = Image.open(image_path).convert("RGB").resize((width, height), Image.BILINEAR)
+        except (OSError, IOError) as e:
+            print(f"Skipping corrupted image: {image_path}, Error: {e}")
+            skipped.append(image_path)
+            continue
+
+        images[count] = np.asarray(image, dtype=np.uint8)
+        labels[count] = label
+        paths.append(os.path.relpath(image_path, root_folder))
+        count += 1
+
+    images.flush()
+    del images
+
+    # 손상된 이미지를 건너뛴 만큼 파일을 잘라냄
+    if count < len(items):
+        full = np.load(os.path.join(output_folder, IMAGES_FILE), mmap_mode='r')
+        trimmed = np.array(full[:count])
+        del full
+        np.save(os.path.join(output_folder, IMAGES_FILE), trimmed)
+
+    np.save(os.path.join(output_folder, LABELS_FILE), labels[:count])
+
+    index = {
+        'root_folder': os.path.abspath(root_folder),
+        'image_shape': [height, width, 3],
+        'classes': classes,
+        'class_to_idx': class_to_idx,
+        'num_images': count,
+        'paths': paths,
+        'skipped': skipped,
+    }
+    with open(os.path.join(output_folder, INDEX_FILE), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+
+    print(f"Packed {count} images ({len(skipped)} skipped) into {output_folder}")
+    return index
+
+
+class PackedDataset(Dataset):
+    """
+    pack_clf_data 결과를 memory-map으로 읽는 Dataset
+    - 배열은 워커마다 처음 접근할 때 mmap으로 열기 때문에 DataLoader 워커끼리 OS 페이지 캐시를 공유함
+    - transform은 (3, H, W) float 텐서를 입력으로 받음 (ToTensor는 이미 적용된 상태)
+    """
+
+    def __init__(self, packed_folder, transform=None):
+        self.packed_folder = packed_folder
+        self.transform = transform
+
+        with open(os.path.join(packed_folder, INDEX_FILE), encoding='utf-8') as f:
+            self.index = json.load(f)
+
+        self.classes = self.index['classes']
+        self.class_to_idx = self.index['class_to_idx']
+        # 라벨은 작으므로 메모리에 올려 둠 (random_split, 통계 계산용)
+        self.labels = np.load(os.path.join(packed_folder, LABELS_FILE))
+        self._images = None
+
+    @property
+    def images(self):
+        if self._images is None:
+            self._images = np.load(os.path.join(self.packed_folder, IMAGES_FILE), mmap_mode='r')
+        return self._images
+
+    def __getstate__(self):
+        # 워커로 넘길 때(spawn) mmap 객체는 빼고 보냄 -> 워커에서 다시 mmap
+        state = self.__dict__.copy()
+        state['_images'] = None
+        return state
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _to_tensor(self, array):
+        # uint8 (..., H, W, 3) -> float (..., 3, H, W), transforms.ToTensor와 동일한 스케일
+        tensor = torch.from_numpy(np.ascontiguousarray(array))
+        return tensor.movedim(-1, -3).float().div_(255)
+
+    def __getitem__(self, index):
+        image = self._to_tensor(self.images[index])
+        if self.transform:
+            image = self.transform(image)
+        return image, int(self.labels[index])
+
+    def __getitems__(self, indices):
+        """ DataLoader 배치 단위 접근: 인덱스를 정렬해서 한 번에 읽음 """
+        indices = np.asarray(indices)
+        order = np.argsort(indices)
+        batch = self._to_tensor(self.images[indices[order]])
+
+        samples = [None] * len(indices)
+        for pos, i in enumerate(order):
+            image = batch[pos]
+            if self.transform:
+                image = self.transform(image)
+            samples[i] = (image, int(self.labels[indices[i]]))
+        return samples
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 3:
+        print("Usage: python pack_dataset.py <clf-data folder> <output folder>")
+        sys.exit(1)
+
+    pack_clf_data(sys.argv[1], sys.argv[2])
@@ -1,21 +1,32 @@
+import sys
 import cv2
 import shutil
+import time
 import uuid
 from pathlib import Path
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.responses import StreamingResponse, FileResponse, HTMLResponse
 from ultralytics import YOLO
 from deep_sort_realtime.deepsort_tracker import DeepSort
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "JKL" / "app"))  # JKL/app 모듈 사용
+from services.storage import StorageManager
+from services.metrics import (FRAMES_TOTAL, JOB_SECONDS, JOBS_IN_PROGRESS, JOBS_TOTAL, MODEL_LOAD_SECONDS,
+                              observe_yolo_speed, timed)
+from routers.metrics import metrics_router
+
 app = FastAPI()
+app.include_router(metrics_router)
 
 # YOLO 11x 모델 및 DeepSORT 초기화 (사용자가 지정할 모델 사용)
+load_start = time.perf_counter()
 yolo_model = YOLO('C:/test/wonjeonghwan/best_3000_xl.pt')
+MODEL_LOAD_SECONDS.set(time.perf_counter() - load_start, model="yolo")
 tracker = DeepSort(max_age=30)  # DeepSORT 추적 모델
 
-# 업로드된 파일 저장 경로
+# 업로드된 파일 저장 경로 (원본 + 처리 결과, 용량/보관 기간은 환경변수로 조정)
 UPLOAD_DIR = Path("C:/test/RAW")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+store = StorageManager.from_env(UPLOAD_DIR, "upload")
 
 
 @app.post("/upload_video/")
@@ -23,13 +34,25 @@ async def upload_video(file: UploadFile = File(...)):
     """
     사용자가 업로드한 영상을 저장 후 분석 시작
     """
-    file_path = UPLOAD_DIR / f"{uuid.uuid4()}.mp4"
-    
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # YOLO + DeepSORT 적용 후 처리된 파일 경로
-    processed_path = process_video(file_path)
+    video_name = f"{uuid.uuid4()}.mp4"
+
+    with store.atomic_write(video_name) as tmp_path:
+        with tmp_path.open("wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+
+    # YOLO + DeepSORT 적용 후 처리된 파일 경로 (분석하는 동안 원본은 삭제되지 않도록 보호)
+    JOBS_IN_PROGRESS.inc()
+    start = time.perf_counter()
+    try:
+        with store.hold(video_name) as (file_path,):
+            processed_path = process_video(file_path)
+    except Exception:
+        JOBS_TOTAL.inc(status="failed")
+        raise
+    finally:
+        JOBS_IN_PROGRESS.dec()
+    JOB_SECONDS.observe(time.perf_counter() - start)
+    JOBS_TOTAL.inc(status="succeeded")
 
     return {
         "message": "영상 업로드 및 분석 완료",
@@ -47,25 +70,32 @@ def process_video(video_path: Path) -> Path:
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     fps = cap.get(cv2.CAP_PROP_FPS)
 
-    output_path = UPLOAD_DIR / f"processed_{video_path.name}"
+    output_name = f"processed_{video_path.name}"
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
 
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
+    with store.atomic_write(output_name) as tmp_path:
+        out = cv2.VideoWriter(str(tmp_path), fourcc, fps, (width, height))
 
-        frame = detect_and_track(frame)
-        out.write(frame)
+        while cap.isOpened():
+            with timed("decode"):
+                ret, frame = cap.read()
+            if not ret:
+                break
 
-    cap.release()
-    out.release()
-    return output_path
+            frame = detect_and_track(frame)
+            with timed("encoding"):
+                out.write(frame)
+            FRAMES_TOTAL.inc()
+
+        cap.release()
+        out.release()
+    return store.path(output_name)
 
 
 def detect_and_track(frame):
     results = yolo_model(frame)[0]  # YOLO 11 탐지 실행
+
+    observe_yolo_speed(results)
     detections = []
 
     # YOLO 결과에서 박스와 신뢰도 추출
@@ -77,22 +107,24 @@ def detect_and_track(frame):
         detections.append([x1, y1, x2, y2, conf])
 
     # DeepSORT 업데이트 (YOLO로 얻은 차량 박스 기반)
-    tracks = tracker.update_tracks(detections, frame=frame)
+    with timed("tracking"):
+        tracks = tracker.update_tracks(detections, frame=frame)
 
     # 추적 결과 박스와 ID 표시
-    for track in tracks:
-        if not track.is_confirmed():
-            continue
+    with timed("drawing"):
+        for track in tracks:
+            if not track.is_confirmed():
+                continue
 
-        track_id = track.track_id
-        ltrb = track.to_ltrb()  # (left, top, right, bottom)
+            track_id = track.track_id
+            ltrb = track.to_ltrb()  # (left, top, right, bottom)
 
-        # 박스 그리기
-        cv2.rectangle(frame, (int(ltrb[0]), int(ltrb[1])), (int(ltrb[2]), int(ltrb[3])), (0, 255, 0), 2)
+            # 박스 그리기
+            cv2.rectangle(frame, (int(ltrb[0]), int(ltrb[1])), (int(ltrb[2]), int(ltrb[3])), (0, 255, 0), 2)
 
-        # 트랙 ID 표시
-        cv2.putText(frame, f"ID: {track_id}", (int(ltrb[0]), int(ltrb[1]) - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+            # 트랙 ID 표시
+            cv2.putText(frame, f"ID: {track_id}", (int(ltrb[0]), int(ltrb[1]) - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
 
     return frame
 
@@ -101,8 +133,9 @@ def stream_video(filename: str):
     """
     분석된 영상 스트리밍
     """
-    file_path = UPLOAD_DIR / filename
-    return FileResponse(file_path, media_type="video/mp4")
+    if not store.exists(filename):
+        raise HTTPException(status_code=404, detail="영상이 존재하지 않습니다.")
+    return FileResponse(store.touch(filename), media_type="video/mp4")
 
 
 @app.get("/download_video/{filename}")
@@ -110,8 +143,9 @@ def download_video(filename: str):
     """
     분석된 영상 다운로드
     """
-    file_path = UPLOAD_DIR / filename
-    return FileResponse(file_path, media_type="video/mp4", filename=filename)
+    if not store.exists(filename):
+        raise HTTPException(status_code=404, detail="영상이 존재하지 않습니다.")
+    return FileResponse(store.touch(filename), media_type="video/mp4", filename=filename)
 
 
 @app.get("/", response_class=HTMLResponse)